@@ -3,6 +3,11 @@ import json
 import faiss
 import numpy as np
 
+BASE = os.path.dirname(__file__)
+
+# Reuse vectors from earlier builds (read by pipeline.py at import)
+os.environ.setdefault("EMBED_CACHE_DIR", os.path.join(BASE, "models", "embed_cache"))
+
 # ---------------------------------------------------
 # Use SAME embedding function as pipeline.py
 # Ensures FAISS dimension is identical (important!)
@@ -11,10 +16,11 @@ try:
     from pipeline import _embed
 except ImportError:
     from src.pipeline import _embed
+from src.index_io import save_vectors
 
-BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "diseases.jsonl")
 OUT = os.path.join(BASE, "models", "faiss_index_diseases.bin")
+EMB_OUT = os.path.join(BASE, "models", "disease_embeddings.npy")
 
 print("📌 Reading diseases.jsonl...")
 
@@ -62,3 +68,7 @@ os.makedirs(os.path.dirname(OUT), exist_ok=True)
 faiss.write_index(index, OUT)
 
 print("✅ SUCCESS: Disease FAISS index saved to ->", OUT)
+
+# Same vectors as a plain matrix; pipeline_disease.py memory-maps it
+save_vectors(EMB_OUT, emb)
+print("✅ SUCCESS: Disease embeddings saved to ->", EMB_OUT)
@@ -4,14 +4,26 @@ import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from src.embed_cache import EmbeddingCache
+from src.index_io import save_vectors
+
 ROOT = os.path.dirname(__file__)
 CONCEPTS = os.path.join(ROOT, "data", "concepts.jsonl")
 OUT = os.path.join(ROOT, "models", "faiss_index.bin")
+EMB_OUT = os.path.join(ROOT, "models", "concept_embeddings.npy")
+# Rows encoded by earlier builds are reused from here
+EMBED_CACHE_DIR = os.environ.get("EMBED_CACHE_DIR") or os.path.join(ROOT, "models", "embed_cache")
 
 MODEL = "intfloat/multilingual-e5-base"
+_model = None
+
 
-print("📌 Loading model:", MODEL)
-model = SentenceTransformer(MODEL)
+def encode(texts):
+    global _model
+    if _model is None:
+        print("📌 Loading model:", MODEL)
+        _model = SentenceTransformer(MODEL)
+    return _model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
 
 texts = []
 with open(CONCEPTS, "r", encoding="utf-8") as f:
@@ -22,7 +34,8 @@ with open(CONCEPTS, "r", encoding="utf-8") as f:
         texts.append(label + ". " + desc)
 
 print("📌 Encoding", len(texts), "concepts…")
-emb = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype("float32")
+cache = EmbeddingCache(MODEL, disk_dir=EMBED_CACHE_DIR)
+emb = cache.encode(texts, encode).astype("float32")
 
 dim = emb.shape[1]
 print("📌 Embedding dim =", dim)
@@ -32,3 +45,7 @@ index.add(emb)
 
 faiss.write_index(index, OUT)
 print("✅ SUCCESS: Saved index to", OUT)
+
+# Same vectors as a plain matrix; pipeline.py memory-maps it for search and rerank
+save_vectors(EMB_OUT, emb)
+print("✅ SUCCESS: Saved concept embeddings to", EMB_OUT)
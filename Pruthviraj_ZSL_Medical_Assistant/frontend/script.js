@@ -5,6 +5,7 @@
 /* --------- Config --------- */
 const BACKEND_JSON_URL = "http://127.0.0.1:8000/predict"; // Try POST JSON first
 const BACKEND_GET_URL = "http://127.0.0.1:8000/predict";  // fallback GET
+const BACKEND_STREAM_URL = "http://127.0.0.1:8000/predict/stream"; // NDJSON, early results first
 const OVERPASS_API = "https://overpass-api.de/api/interpreter";
 const NEARBY_RADIUS = 5000; // meters
 const MAX_DOCTORS = 10;
@@ -19,6 +20,7 @@ const L = {
     en: {
         tip_loc: "Tip: Allow location access to find nearby doctors. Uses free OpenStreetMap data.",
         analyzing: "⏳ Analyzing…",
+        refining: "⏳ Refining results…",
         no_input: "⚠ Please enter symptoms!",
         server_err: "❌ Server Error:",
         network_err: "❌ Network Error:",
@@ -31,6 +33,7 @@ const L = {
     hi: {
         tip_loc: "टिप: पास के डॉक्टर खोजने के लिए लोकेशन की अनुमति दें। (OpenStreetMap का उपयोग करता है)",
         analyzing: "⏳ विश्लेषण किया जा रहा है…",
+        refining: "⏳ परिणाम बेहतर किए जा रहे हैं…",
         no_input: "⚠ कृपया लक्षण दर्ज करें!",
         server_err: "❌ सर्वर त्रुटि:",
         network_err: "❌ नेटवर्क त्रुटि:",
@@ -43,6 +46,7 @@ const L = {
     mr: {
         tip_loc: "टीप: जवळील डॉक्टर शोधण्यासाठी स्थान प्रवेश द्या. (OpenStreetMap वापरते)",
         analyzing: "⏳ विश्लेषण चालू आहे…",
+        refining: "⏳ निकाल अधिक अचूक केले जात आहेत…",
         no_input: "⚠ कृपया लक्षणे प्रविष्ट करा!",
         server_err: "❌ सर्व्हर त्रुटी:",
         network_err: "❌ नेटवर्क त्रुटी:",
@@ -126,6 +130,63 @@ function setStatus(msg, isError = false) {
     s.style.color = isError ? "#ffd3d3" : "rgba(255,255,255,0.95)";
 }
 
+/* Remove duplicates between symptom predictions and diseases by label */
+function dedupeByLabel(data) {
+    if (Array.isArray(data.predictions) && Array.isArray(data.diseases)) {
+        const diseaseLabels = new Set(data.diseases.map(d => String(d.label || "").toLowerCase()));
+        data.predictions = data.predictions.filter(p => !diseaseLabels.has(String(p.label || "").toLowerCase()));
+    }
+    return data;
+}
+
+/* Server error card + status line */
+function showServerError(status) {
+    setStatus(`${t("server_err")} ${status}`, true);
+    document.getElementById("output").innerHTML =
+        `<div class="card"><p style="color:#d00">${t("server_err")} ${status}</p></div>`;
+}
+
+/* Streaming analyze: render each NDJSON line as it arrives.
+   Returns "fallback" only if the server has no stream endpoint (404/405)
+   or doesn't answer with NDJSON, so the caller can use /predict instead.
+   Any other error (e.g. 503 while the server sheds load) is shown and
+   returns "error": retrying on /predict would only add load. */
+async function analyzeStream(txt) {
+    const res = await fetch(BACKEND_STREAM_URL, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ symptoms: txt })
+    });
+    if (res.status === 404 || res.status === 405) return "fallback";
+    if (!res.ok) {
+        showServerError(res.status);
+        return "error";
+    }
+    const isStream = (res.headers.get("Content-Type") || "").includes("ndjson");
+    if (!res.body || !isStream) return "fallback";
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    let rendered = false;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (value) buf += decoder.decode(value, { stream: true });
+        let nl;
+        while ((nl = buf.indexOf("\n")) >= 0) {
+            const line = buf.slice(0, nl).trim();
+            buf = buf.slice(nl + 1);
+            if (!line) continue;
+            const data = dedupeByLabel(JSON.parse(line));
+            renderOutput(data);
+            rendered = true;
+            setStatus(data.final ? "" : t("refining"));
+        }
+        if (done) break;
+    }
+    return rendered ? "done" : "fallback";
+}
+
 /* Analyze -> backend */
 async function analyze() {
     const txt = document.getElementById("symptoms").value.trim();
@@ -135,6 +196,14 @@ async function analyze() {
     document.getElementById("output").innerHTML = "";
 
     try {
+        const streamed = await analyzeStream(txt);
+        if (streamed === "error") return;
+        if (streamed === "done") {
+            setStatus("");
+            if (userLocation) fetchNearbyDoctors(userLocation.lat, userLocation.lon);
+            return;
+        }
+
         let res = await fetch(BACKEND_JSON_URL, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
@@ -148,19 +217,11 @@ async function analyze() {
         }
 
         if (!res.ok) {
-            setStatus(`${t("server_err")} ${res.status}`, true);
-            document.getElementById("output").innerHTML =
-                `<div class="card"><p style="color:#d00">${t("server_err")} ${res.status}</p></div>`;
+            showServerError(res.status);
             return;
         }
 
-        const data = await res.json();
-
-        // Remove duplicates between symptom predictions and diseases by label
-        if (Array.isArray(data.predictions) && Array.isArray(data.diseases)) {
-            const diseaseLabels = new Set(data.diseases.map(d => String(d.label || "").toLowerCase()));
-            data.predictions = data.predictions.filter(p => !diseaseLabels.has(String(p.label || "").toLowerCase()));
-        }
+        const data = dedupeByLabel(await res.json());
 
         renderOutput(data);
         setStatus("");
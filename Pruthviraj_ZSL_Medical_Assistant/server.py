@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import uvicorn
+import asyncio
+import hmac
+import json
 import os
 import sys
+import time
 
 # ----------------------------
 # PATH FIX
@@ -13,13 +19,121 @@ SRC_DIR = os.path.join(BASE_DIR, "src")
 sys.path.insert(0, BASE_DIR)
 sys.path.insert(0, SRC_DIR)
 
+# ----------------------------
+# Inference executor
+# ----------------------------
+# Model calls run on a fixed pool of INFER_WORKERS threads, each capped at
+# INFER_TORCH_THREADS math threads, with at most INFER_QUEUE_MAX tasks
+# waiting. Shared state: always import through the src package.
+from src.executor import InferenceExecutor, QueueFull, pin_threads
+from src import metrics, resources, timing, tracing
+
+INFER_WORKERS = int(os.environ.get("INFER_WORKERS", "2"))
+INFER_QUEUE_MAX = int(os.environ.get("INFER_QUEUE_MAX", "64"))
+INFER_TORCH_THREADS = int(os.environ.get("INFER_TORCH_THREADS", "0")) or \
+    max(1, (os.cpu_count() or 1) // max(1, INFER_WORKERS))
+pin_threads(INFER_TORCH_THREADS)   # before torch/faiss are imported below
+
+_executor = InferenceExecutor(workers=INFER_WORKERS, max_queue=INFER_QUEUE_MAX,
+                              torch_threads=INFER_TORCH_THREADS)
+
+# A pipeline stage slower than STAGE_TIMEOUT_S is dropped from the response
+# instead of holding it up
+STAGE_TIMEOUT_S = float(os.environ.get("STAGE_TIMEOUT_S", "20"))
+
+# ----------------------------
+# Admission control
+# ----------------------------
+# Each /predict gets a deadline (PREDICT_DEADLINE_MS unless the request sets
+# deadline_ms). As the executor backlog fills past the DEGRADE_*/SHED_AT
+# fractions of INFER_QUEUE_MAX, new requests skip NLI, then also search a
+# smaller top-k (DEGRADE_TOPK), and finally get 503 + Retry-After.
+from src.admission import TIERS, AdmissionController
+
+PREDICT_DEADLINE_MS = int(os.environ.get("PREDICT_DEADLINE_MS", "5000"))
+DEGRADE_NO_NLI_AT = float(os.environ.get("DEGRADE_NO_NLI_AT", "0.25"))
+DEGRADE_TOPK_AT = float(os.environ.get("DEGRADE_TOPK_AT", "0.5"))
+SHED_AT = float(os.environ.get("SHED_AT", "0.9"))
+DEGRADE_TOPK = int(os.environ.get("DEGRADE_TOPK", "10"))
+RETRY_AFTER_S = int(os.environ.get("RETRY_AFTER_S", "2"))
+
+_admission = AdmissionController(_executor, no_nli_at=DEGRADE_NO_NLI_AT,
+                                 reduced_topk_at=DEGRADE_TOPK_AT, shed_at=SHED_AT,
+                                 retry_after_s=RETRY_AFTER_S)
+
 # ----------------------------
 # Import Symptom Pipeline
 # ----------------------------
 try:
-    from pipeline import infer
+    from pipeline import infer_batch, infer_stream, make_queries, embed_queries, TOPK, \
+        warmup as warmup_pipeline
+    from pipeline import version as pipeline_version
 except ImportError:
-    from src.pipeline import infer
+    from src.pipeline import infer_batch, infer_stream, make_queries, embed_queries, TOPK, \
+        warmup as warmup_pipeline
+    from src.pipeline import version as pipeline_version
+
+try:
+    from normalise import warmup as warmup_normalise
+    from normalise import version as normalise_version
+except ImportError:
+    from src.normalise import warmup as warmup_normalise
+    from src.normalise import version as normalise_version
+
+try:
+    from triage import simple_triage
+except ImportError:
+    from src.triage import simple_triage
+
+try:
+    from batcher import MicroBatcher
+except ImportError:
+    from src.batcher import MicroBatcher
+
+# Micro-batching: concurrent /predict calls are grouped for up to
+# PREDICT_MAX_WAIT_MS or PREDICT_MAX_BATCH requests, whichever comes first
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "16"))
+PREDICT_MAX_WAIT_MS = float(os.environ.get("PREDICT_MAX_WAIT_MS", "5"))
+
+# /predict/batch: at most PREDICT_BATCH_MAX_ITEMS texts per call, run through
+# the pipelines PREDICT_BATCH_CHUNK texts at a time
+PREDICT_BATCH_MAX_ITEMS = int(os.environ.get("PREDICT_BATCH_MAX_ITEMS", "256"))
+PREDICT_BATCH_CHUNK = int(os.environ.get("PREDICT_BATCH_CHUNK", "32"))
+
+# ----------------------------
+# Response cache
+# ----------------------------
+# Complete /predict responses are cached for RESPONSE_CACHE_TTL_S, keyed on
+# the tier, the model/index version and both the raw and the normalized
+# text; at most RESPONSE_CACHE_SIZE entries (LRU). The raw text is looked
+# up before admission control, so a repeat is answered even under load
+# (from the best tier cached); the normalized text is looked up in the
+# micro-batch, right after normalization. Identical requests already in
+# flight share one computation. Partial, NLI-degraded or untranslated
+# responses are not cached. RESPONSE_CACHE_SIZE=0 disables the cache.
+from src.cache import SingleFlight, TTLCache
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_S = float(os.environ.get("RESPONSE_CACHE_TTL_S", "300"))
+
+_response_cache = TTLCache(RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_S)
+_response_inflight = SingleFlight()
+
+RESPONSE_CACHE = metrics.Counter("response_cache_requests_total",
+                                 "/predict response cache lookups", labels=("result",))
+
+
+def _response_hit_ratio() -> float:
+    # coalesced requests count as hits: they didn't run the pipeline either
+    served = RESPONSE_CACHE.value(result="hit") + RESPONSE_CACHE.value(result="coalesced")
+    total = served + RESPONSE_CACHE.value(result="miss")
+    return served / total if total else 0.0
+
+
+metrics.Gauge("response_cache_hit_ratio", "/predict response cache hit ratio",
+              fn=_response_hit_ratio)
+metrics.Gauge("response_cache_size", "/predict responses currently cached",
+              fn=lambda: len(_response_cache))
 
 
 # ----------------------------
@@ -33,8 +147,68 @@ def load_disease_model():
     return predict_disease
 
 
+def load_disease_batch_model():
+    try:
+        from pipeline_disease import predict_disease_batch
+    except ImportError:
+        from src.pipeline_disease import predict_disease_batch
+    return predict_disease_batch
+
+
+def load_disease_version():
+    try:
+        from pipeline_disease import version
+    except ImportError:
+        from src.pipeline_disease import version
+    return version
+
+
+# ----------------------------
+# Warm-up / readiness
+# ----------------------------
+# On startup every model and index is loaded and a few inferences are run
+# on the inference executor; /readyz reports ready only after that.
+# WARMUP_TRANSLATOR=0 skips preloading the (large) NLLB translator.
+WARMUP_TRANSLATOR = os.environ.get("WARMUP_TRANSLATOR", "1") != "0"
+
+_warm = {"ready": False, "error": None}
+
+
+def _warmup():
+    warmup_normalise(translator=WARMUP_TRANSLATOR)
+    warmup_pipeline()
+    try:
+        from pipeline_disease import warmup as warmup_disease
+    except ImportError:
+        from src.pipeline_disease import warmup as warmup_disease
+    warmup_disease()
+
+
+async def _run_warmup():
+    try:
+        await _executor.run(_warmup)
+        _warm["ready"] = True
+        print("✅ Models loaded and warmed up")
+    except Exception as e:
+        _warm["error"] = str(e)
+        print(f"[WARNING] Warm-up failed: {e}")
+
+
 app = FastAPI(title="AI Health Assistant API")
 
+REQUEST_SECONDS = metrics.Histogram("http_request_seconds", "Time to produce a response, by route",
+                                    labels=("path", "status"))
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")   # route template, so unknown URLs share a label
+    REQUEST_SECONDS.observe(time.perf_counter() - t0,
+                            path=getattr(route, "path", "other"), status=response.status_code)
+    return response
+
 # ----------------------------
 # CORS
 # ----------------------------
@@ -51,49 +225,57 @@ app.add_middleware(
 # ----------------------------
 class PredictRequest(BaseModel):
     symptoms: str
+    deadline_ms: Optional[int] = None
+
+
+class BatchPredictRequest(BaseModel):
+    texts: List[str]
 
 
 class DiseaseRequest(BaseModel):
     text: str
 
 
+@app.on_event("startup")
+async def start_warmup():
+    asyncio.get_running_loop().create_task(_run_warmup())
+
+
 @app.get("/")
 def root():
     return {"message": "AI Health Assistant Backend Running"}
 
 
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    if _warm["ready"]:
+        return {"status": "ready", "resources": resources.stats()}
+    status = "error" if _warm["error"] else "warming"
+    return JSONResponse({"status": status, "error": _warm["error"],
+                         "resources": resources.stats()}, status_code=503)
+
+
 # ------------------------------------------------------
 # MAIN ENDPOINT — MERGED PREDICTION (SYMBOLS + DISEASES)
 # ------------------------------------------------------
-@app.post("/predict")
-def predict(req: PredictRequest):
-    symptoms = req.symptoms.strip()
-    if not symptoms:
-        return {"error": "Symptoms required"}
-
-    # -------------------------
-    # 1) Symptom predictions
-    # -------------------------
-    base = infer(symptoms)
-
+def _merge(symptoms: str, base: dict, dis_out: dict = None, disease_error: str = None) -> dict:
     # Always force fields (safety)
     base.setdefault("predictions", [])
     base.setdefault("triage", "low")
     base.setdefault("normalized_text", symptoms)
 
-    # -------------------------
-    # 2) Disease predictions
-    # -------------------------
+    # disease_out has format: {"predictions":[ ... ]}
     diseases = []
-    try:
-        predict_disease = load_disease_model()
-        dis_out = predict_disease(symptoms)
-
-        # disease_out has format: {"predictions":[ ... ]}
-        diseases_raw = dis_out.get("predictions", [])
-
+    if disease_error is not None:
+        base["disease_error"] = disease_error
+    else:
         # normalize structure
-        for d in diseases_raw:
+        for d in (dis_out or {}).get("predictions", []):
             diseases.append({
                 "label": d.get("label", ""),
                 "score": d.get("score", 0),
@@ -102,40 +284,416 @@ def predict(req: PredictRequest):
                 "recommended_tests": d.get("recommended_tests", [])
             })
 
-    except Exception as e:
-        diseases = []
-        base["disease_error"] = str(e)
-
-    # -------------------------
-    # 3) REMOVE DUPLICATE labels
-    # -------------------------
+    # REMOVE DUPLICATE labels
     symptom_labels = set(p.get("label", "").lower() for p in base["predictions"])
     diseases = [d for d in diseases if d.get("label", "").lower() not in symptom_labels]
 
-    # -------------------------
-    # 4) Attach cleaned disease list
-    # -------------------------
+    # Attach cleaned disease list + final clean response
     base["diseases"] = diseases
-
-    # -------------------------
-    # 5) Final clean response
-    # -------------------------
     base.setdefault("disclaimer", "Informational only; not a medical diagnosis.")
-
     return base
 
 
+async def _stage(fn, *args, **kwargs):
+    """Run one pipeline stage with STAGE_TIMEOUT_S; returns (result, error)."""
+    try:
+        return await asyncio.wait_for(_executor.run(fn, *args, **kwargs), STAGE_TIMEOUT_S), None
+    except asyncio.TimeoutError:
+        return None, "timeout"
+    except Exception as e:
+        return None, str(e)
+
+
+def _predict_diseases(texts: List[str], queries) -> List[dict]:
+    predict_disease_batch = load_disease_batch_model()
+    with timing.stage("disease"):
+        return predict_disease_batch(texts, qvs=[q.qv[0] for q in queries])
+
+
+def _infer_symptoms(texts: List[str], **kwargs) -> List[dict]:
+    with timing.stage("symptoms"):
+        return infer_batch(texts, **kwargs)
+
+
+async def _predict_tier(texts: List[str], tier: str = "full", queries=None) -> List[dict]:
+    """
+    Full /predict response for each text. Each text is normalized and
+    embedded once (unless `queries` already holds them); the symptom and
+    disease pipelines then run concurrently on the query vectors and are
+    merged when both finish. If a stage fails or times out, the response
+    carries what the other stage produced and is marked "partial".
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    if queries is None:
+        queries = await _executor.run(make_queries, texts)
+
+    (bases, symptom_error), (dis_outs, disease_error) = await asyncio.gather(
+        _stage(_infer_symptoms, texts, queries=queries,
+               use_nli=(tier == "full"),
+               k=DEGRADE_TOPK if tier == "reduced_topk" else TOPK),
+        _stage(_predict_diseases, texts, queries),
+    )
+    _admission.observe(tier, loop.time() - started)
+
+    out = []
+    for i, (t, q) in enumerate(zip(texts, queries)):
+        if bases is None:
+            base = {
+                "normalized_text": q.premise,
+                "predictions": [],
+                "triage": simple_triage([], q.premise),
+                "symptom_error": symptom_error,
+            }
+        else:
+            base = bases[i]
+        if dis_outs is None:
+            res = _merge(t, base, disease_error=disease_error)
+        else:
+            res = _merge(t, base, dis_outs[i])
+        if symptom_error is not None or disease_error is not None:
+            res["partial"] = True
+        res["tier"] = tier
+        out.append(res)
+    return out
+
+
+async def _predict_group(texts: List[str], tier: str, captured: list) -> List[dict]:
+    if not captured:
+        return await _predict_uncached(texts, tier)
+    # traced/profiled callers in this batch all get the batch's spans
+    with tracing.batch_scope(captured, "predict_batch", size=len(texts), tier=tier):
+        return await _predict_uncached(texts, tier)
+
+
+async def _predict_batch(items: List[tuple]) -> List[dict]:
+    """
+    Micro-batch entry point: items are (text, tier, tracing.capture());
+    each tier runs as its own batch.
+    """
+    groups = {}
+    for i, (_, tier, _) in enumerate(items):
+        groups.setdefault(tier, []).append(i)
+
+    results = await asyncio.gather(*[
+        _predict_group([items[i][0] for i in idxs], tier,
+                       [items[i][2] for i in idxs if items[i][2] is not None])
+        for tier, idxs in groups.items()
+    ])
+
+    out = [None] * len(items)
+    for idxs, res in zip(groups.values(), results):
+        for i, r in zip(idxs, res):
+            out[i] = r
+    return out
+
+
+_predict_batcher = MicroBatcher(_predict_batch,
+                                max_batch=PREDICT_MAX_BATCH,
+                                max_wait_ms=PREDICT_MAX_WAIT_MS)
+
+
+def _busy() -> JSONResponse:
+    return JSONResponse({"error": "Server busy, try again shortly"}, status_code=503,
+                        headers={"Retry-After": str(RETRY_AFTER_S)})
+
+
+def _response_version() -> tuple:
+    return (TOPK, DEGRADE_TOPK, normalise_version(), pipeline_version(),
+            load_disease_version()())
+
+
+def _cacheable(res: dict) -> bool:
+    return not (res.get("partial") or res.get("nli_degraded") or res.get("translation_failed"))
+
+
+def _cached_response(symptoms: str, tiers, version: tuple) -> Optional[dict]:
+    """The first cached response for this raw text among `tiers`."""
+    for tier in tiers:
+        res = _response_cache.get(("text", symptoms, tier, version))
+        if res is not None:
+            return res
+    return None
+
+
+def _prepare_queries(texts: List[str], tier: str, version: tuple):
+    """
+    Normalize texts and look their premises up in the response cache;
+    only the misses are embedded. Runs on the inference executor.
+    """
+    queries = make_queries(texts, embed=False)
+    cached = [_response_cache.get(("premise", q.premise, tier, version)) for q in queries]
+    embed_queries([q for q, res in zip(queries, cached) if res is None])
+    return queries, cached
+
+
+async def _predict_uncached(texts: List[str], tier: str) -> List[dict]:
+    """_predict_tier() for the texts whose normalized premise has no cached response."""
+    if RESPONSE_CACHE_SIZE <= 0:
+        return await _predict_tier(texts, tier)
+    version = _response_version()
+    queries, out = await _executor.run(_prepare_queries, texts, tier, version)
+    todo = [i for i, res in enumerate(out) if res is None]
+    RESPONSE_CACHE.inc(len(texts) - len(todo), result="hit")
+    RESPONSE_CACHE.inc(len(todo), result="miss")
+    if todo:
+        fresh = await _predict_tier([texts[i] for i in todo], tier, [queries[i] for i in todo])
+        for i, res in zip(todo, fresh):
+            out[i] = res
+            if _cacheable(res):
+                _response_cache.put(("premise", queries[i].premise, tier, version), res)
+    return out
+
+
+async def _predict_cached(symptoms: str, tier: str) -> dict:
+    """
+    One /predict response after a raw-text cache miss. Identical texts in
+    flight share one computation; the micro-batch checks the normalized
+    text before running the pipelines.
+    """
+    if RESPONSE_CACHE_SIZE <= 0:
+        return await _predict_batcher.submit((symptoms, tier, tracing.capture()))
+
+    key = ("text", symptoms, tier, _response_version())
+    if _response_inflight.joining(key):
+        RESPONSE_CACHE.inc(result="coalesced")
+
+    async def compute():
+        res = await _predict_batcher.submit((symptoms, tier, tracing.capture()))
+        if _cacheable(res):
+            _response_cache.put(key, res)
+        return res
+
+    return await _response_inflight.do(key, compute)
+
+
+def _force_trace(request: Request) -> bool:
+    return request.headers.get("x-trace") == "1"
+
+
+@app.post("/predict")
+async def predict(req: PredictRequest, request: Request):
+    symptoms = req.symptoms.strip()
+    if not symptoms:
+        return {"error": "Symptoms required"}
+
+    # a cached answer needs no model work, so it is served whatever the load
+    version = _response_version() if RESPONSE_CACHE_SIZE > 0 else None
+    if version is not None:
+        res = _cached_response(symptoms, TIERS[:1], version)
+        if res is not None:
+            RESPONSE_CACHE.inc(result="hit")
+            return res
+
+    budget_s = (req.deadline_ms or PREDICT_DEADLINE_MS) / 1000.0
+    tier = _admission.choose(budget_s)
+    if version is not None and tier != TIERS[0]:
+        # under load: a cached answer from any tier at least as good as the
+        # one we'd compute (any tier at all, rather than a 503)
+        res = _cached_response(symptoms, TIERS[1:TIERS.index(tier) + 1] if tier else TIERS[1:],
+                               version)
+        if res is not None:
+            RESPONSE_CACHE.inc(result="hit")
+            return res
+    if tier is None:
+        return _busy()
+
+    # symptom text stays out of traces; only its length is recorded
+    with tracing.trace("predict", force=_force_trace(request), tier=tier, chars=len(symptoms)), \
+            tracing.profile_request("predict"):
+        try:
+            return await asyncio.wait_for(_predict_cached(symptoms, tier), budget_s)
+        except (QueueFull, asyncio.TimeoutError):
+            return _busy()
+
+
+async def _predict_isolated(texts: List[str], tier: str) -> List[dict]:
+    """
+    _predict_tier() for a chunk; if the chunk fails as a whole, retry its
+    texts one by one so a single bad item only fails itself.
+    """
+    try:
+        return await _predict_tier(texts, tier)
+    except QueueFull:
+        raise
+    except Exception as e:
+        if len(texts) == 1:
+            return [{"error": str(e)}]
+    out = []
+    for t in texts:
+        out.extend(await _predict_isolated([t], tier))
+    return out
+
+
+@app.post("/predict/batch")
+async def predict_batch(req: BatchPredictRequest, request: Request):
+    """
+    /predict for many texts in one call. Results come back in input
+    order; an item that fails carries an "error" instead of failing the
+    whole batch.
+    """
+    if len(req.texts) > PREDICT_BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {PREDICT_BATCH_MAX_ITEMS} texts per batch"},
+                            status_code=413)
+
+    tier = _admission.choose()
+    if tier is None:
+        return _busy()
+
+    with tracing.trace("predict_batch", force=_force_trace(request), tier=tier,
+                       items=len(req.texts)), \
+            tracing.profile_request("predict_batch"):
+        return await _predict_many(req.texts, tier)
+
+
+async def _predict_many(texts: List[str], tier: str):
+    texts = [(t or "").strip() for t in texts]
+    results = [{"error": "Symptoms required"} if not t else None for t in texts]
+    todo = [i for i, t in enumerate(texts) if t]
+
+    for start in range(0, len(todo), PREDICT_BATCH_CHUNK):
+        chunk = todo[start:start + PREDICT_BATCH_CHUNK]
+        try:
+            res = await _predict_isolated([texts[i] for i in chunk], tier)
+        except QueueFull:
+            if start == 0:
+                return _busy()
+            for i in todo[start:]:
+                results[i] = {"error": "Server busy, try again shortly"}
+            break
+        for i, r in zip(chunk, res):
+            results[i] = r
+
+    return {"results": results, "tier": tier}
+
+
+def _ndjson(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@app.post("/predict/stream")
+async def predict_stream(req: PredictRequest, request: Request):
+    """
+    /predict as NDJSON, one full response per line. The first line has
+    the retrieval-stage predictions, triage and diseases; each following
+    line refreshes the predictions after an NLI batch. The last line has
+    "final": true.
+    """
+    symptoms = req.symptoms.strip()
+    if not symptoms:
+        return {"error": "Symptoms required"}
+
+    tier = _admission.choose((req.deadline_ms or PREDICT_DEADLINE_MS) / 1000.0)
+    if tier is None:
+        return _busy()
+    try:
+        queries = await _executor.run(make_queries, [symptoms])
+    except QueueFull:
+        return _busy()
+
+    steps = infer_stream(symptoms, query=queries[0],
+                         use_nli=(tier == "full"),
+                         k=DEGRADE_TOPK if tier == "reduced_topk" else TOPK)
+
+    force = _force_trace(request)
+
+    async def events():
+        with tracing.trace("predict_stream", force=force, tier=tier, chars=len(symptoms)):
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            (base, symptom_error), (dis_outs, disease_error) = await asyncio.gather(
+                _stage(next, steps, None),
+                _stage(_predict_diseases, [symptoms], queries),
+            )
+            dis_out = dis_outs[0] if dis_outs is not None else None
+
+            while True:
+                if base is None:
+                    q = queries[0]
+                    base = {
+                        "normalized_text": q.premise,
+                        "predictions": [],
+                        "triage": simple_triage([], q.premise),
+                        "symptom_error": symptom_error,
+                        "final": True,
+                    }
+                res = _merge(symptoms, base, dis_out, disease_error=disease_error)
+                if symptom_error is not None or disease_error is not None:
+                    res["partial"] = True
+                res["tier"] = tier
+                yield _ndjson(res)
+                if res.get("final"):
+                    break
+                base, symptom_error = await _stage(next, steps, None)
+
+            _admission.observe(tier, loop.time() - started)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 # ---------------------------------------------
 # OPTIONAL direct disease endpoint
 # ---------------------------------------------
 @app.post("/predict_disease")
-def predict_disease_endpoint(req: DiseaseRequest):
+async def predict_disease_endpoint(req: DiseaseRequest, request: Request):
     txt = req.text.strip()
     if not txt:
         return {"error": "Text required"}
 
     predict_disease = load_disease_model()
-    return predict_disease(txt)
+    with tracing.trace("predict_disease", force=_force_trace(request), chars=len(txt)), \
+            tracing.profile_request("predict_disease"):
+        try:
+            return await _executor.run(predict_disease, txt)
+        except QueueFull:
+            return _busy()
+
+
+# ---------------------------------------------
+# Admin: on-demand profiling
+# ---------------------------------------------
+# POST {"mode": "cprofile" | "tracemalloc", "requests": N} profiles the next
+# N requests (reports under tracing.PROFILE_DIR). Needs the X-Admin-Token
+# header to match ADMIN_TOKEN; without ADMIN_TOKEN the endpoint is off.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+class ProfileRequest(BaseModel):
+    mode: str = "cprofile"
+    requests: int = 1
+
+
+def _admin_denied(request: Request) -> Optional[JSONResponse]:
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode("utf-8"),
+                                                  ADMIN_TOKEN.encode("utf-8")):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return None
+
+
+@app.get("/admin/profile")
+def profile_status(request: Request):
+    return _admin_denied(request) or tracing.armed()
+
+
+@app.post("/admin/profile")
+def profile_arm(req: ProfileRequest, request: Request):
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    try:
+        tracing.arm(req.mode, req.requests)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return tracing.armed()
+
+
+# ---------------------------------------------
+# Metrics (Prometheus text format)
+# ---------------------------------------------
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
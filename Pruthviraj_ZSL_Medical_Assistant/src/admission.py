@@ -0,0 +1,79 @@
+# src/admission.py
+import threading
+from typing import Dict, Optional
+
+from .executor import InferenceExecutor
+from .metrics import Counter
+
+# Degradation ladder, best first:
+#   full          retrieval + lexical + NLI
+#   no_nli        retrieval + lexical only (no entailment model)
+#   reduced_topk  no NLI and a smaller FAISS top-k
+# Below the last tier the request is shed (503 + Retry-After).
+TIERS = ("full", "no_nli", "reduced_topk")
+
+SERVED = Counter("predict_tier_total", "Requests admitted, by degradation tier", labels=("tier",))
+SHED = Counter("predict_shed_total", "Requests rejected by admission control", labels=("reason",))
+
+
+class AdmissionController:
+    """
+    Pick a degradation tier for each request from current load and its
+    deadline.
+
+    Load is the inference executor's backlog as a fraction of its queue
+    limit; crossing `no_nli_at`, `reduced_topk_at` and `shed_at` moves
+    new requests one rung down the ladder. On top of that, a tier whose
+    recent latency plus the expected queue wait would overrun the
+    request's remaining budget is skipped.
+    """
+
+    def __init__(self, executor: InferenceExecutor, no_nli_at: float = 0.25,
+                 reduced_topk_at: float = 0.5, shed_at: float = 0.9,
+                 retry_after_s: int = 2, alpha: float = 0.2):
+        self.executor = executor
+        self.no_nli_at = no_nli_at
+        self.reduced_topk_at = reduced_topk_at
+        self.shed_at = shed_at
+        self.retry_after_s = retry_after_s
+        self.alpha = alpha
+        self._latency: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, tier: str, seconds: float) -> None:
+        """Feed back how long a batch served at `tier` took."""
+        with self._lock:
+            prev = self._latency.get(tier)
+            self._latency[tier] = seconds if prev is None else \
+                prev + self.alpha * (seconds - prev)
+
+    def load(self) -> float:
+        return self.executor.depth / max(1, self.executor.max_queue)
+
+    def choose(self, budget_s: Optional[float] = None) -> Optional[str]:
+        """Tier to serve a request with `budget_s` seconds left, or None to shed."""
+        load = self.load()
+        if load >= self.shed_at:
+            SHED.inc(reason="load")
+            return None
+        if load >= self.reduced_topk_at:
+            start = 2
+        elif load >= self.no_nli_at:
+            start = 1
+        else:
+            start = 0
+
+        if budget_s is None:
+            SERVED.inc(tier=TIERS[start])
+            return TIERS[start]
+
+        # tasks ahead of us, spread over the workers
+        per_task = min(self._latency.values()) if self._latency else 0.0
+        wait = self.executor.depth * per_task / max(1, self.executor.workers)
+        for tier in TIERS[start:]:
+            est = self._latency.get(tier)
+            if est is None or wait + est <= budget_s:
+                SERVED.inc(tier=tier)
+                return tier
+        SHED.inc(reason="deadline")
+        return None
@@ -0,0 +1,73 @@
+# src/batcher.py
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into batches.
+
+    submit() calls are collected for up to `max_wait_ms` (or until
+    `max_batch` items are waiting) and passed together to
+    `fn(items) -> results`, a coroutine function returning one result per
+    item. Each caller gets back its own result, or the batch's exception.
+    Batches are dispatched as soon as they are collected, so a slow batch
+    doesn't hold up collection of the next one.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch: int = 16, max_wait_ms: float = 5.0):
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            # fresh context: batches must not inherit the first caller's contextvars
+            self._collector = contextvars.Context().run(loop.create_task, self._collect())
+        fut = loop.create_future()
+        self._queue.put_nowait((item, fut))
+        return await fut
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                getter = loop.create_task(self._queue.get())
+                await asyncio.wait({getter}, timeout=remaining)
+                if not getter.done():
+                    # cancelling a pending Queue.get never drops an item
+                    getter.cancel()
+                    break
+                batch.append(getter.result())
+
+            task = loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            results = await self.fn(items)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
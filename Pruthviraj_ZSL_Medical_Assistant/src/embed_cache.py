@@ -0,0 +1,182 @@
+# src/embed_cache.py
+"""
+Embedding cache: an in-process LRU in front of an optional on-disk tier.
+
+Vectors are keyed by encoder model, text prefix (e.g. e5's "query: ")
+and a hash of the text. The disk tier keeps one directory per
+model/prefix holding `vectors.f32` (raw float32 rows, memory-mapped for
+reads) and `keys.txt` (one text hash per line, row i = line i). Rows are
+only ever appended, under a file lock, so several processes can share a
+directory and index rebuilds only encode rows they haven't seen. Data
+past the last complete key line (a writer that died mid-append) is cut
+off before the next append, so keys and rows stay aligned.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .cache import LRUCache
+from .metrics import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+LOOKUPS = Counter("embed_cache_lookups_total", "Embedding cache lookups, by tier that answered",
+                  labels=("result",))
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keys_path = os.path.join(path, "keys.txt")
+        self.vec_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._nrows = 0            # lines of keys.txt already indexed
+        self._keys_read = 0        # bytes of keys.txt already indexed
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        """Pick up rows appended since the last look (by us or another process)."""
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+        try:
+            size = os.path.getsize(self.keys_path)
+        except OSError:
+            return
+        if size <= self._keys_read:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_read)
+            chunk = f.read(size - self._keys_read)
+        end = chunk.rfind(b"\n") + 1        # ignore a partly written last line
+        for line in chunk[:end].decode("utf-8").splitlines():
+            # row number = line number, even if a key somehow repeats
+            self._rows.setdefault(line, self._nrows)
+            self._nrows += 1
+        self._keys_read += end
+        self._mm = None
+
+    def _vectors(self) -> Optional[np.memmap]:
+        if self._mm is None and self._rows and self.dim:
+            self._mm = np.memmap(self.vec_path, dtype="float32", mode="r",
+                                 shape=(self._nrows, self.dim))
+        return self._mm
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            self._refresh()
+            rows = [(k, self._rows[k]) for k in keys if k in self._rows]
+            if not rows:
+                return {}
+            vecs = self._vectors()
+            if vecs is None:
+                return {}
+            return {k: np.array(vecs[r]) for k, r in rows}
+
+    def put_many(self, keys: List[str], vecs: np.ndarray) -> None:
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        with self._lock, open(self.keys_path, "ab") as kf:
+            if fcntl is not None:
+                fcntl.flock(kf, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if self.dim is None:
+                    self.dim = int(vecs.shape[1])
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self.dim}, f)
+                elif vecs.shape[1] != self.dim:
+                    raise ValueError(f"embedding dim {vecs.shape[1]} != cached dim {self.dim}")
+                new = [i for i, k in enumerate(keys) if k not in self._rows]
+                new = list({keys[i]: i for i in new}.values())   # one row per key
+                if not new:
+                    return
+                # vectors before keys: a key line never points past the data.
+                # Drop what a writer that died mid-append left behind (rows
+                # without keys, a partial key line), or the next key would
+                # point at an orphan's vector.
+                if os.fstat(kf.fileno()).st_size > self._keys_read:
+                    kf.truncate(self._keys_read)
+                with open(self.vec_path, "ab") as vf:
+                    size = self._nrows * self.dim * 4
+                    if os.fstat(vf.fileno()).st_size > size:
+                        vf.truncate(size)
+                    vf.write(vecs[new].tobytes())
+                kf.write("".join(keys[i] + "\n" for i in new).encode("utf-8"))
+                kf.flush()
+                self._refresh()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(kf, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Memoize an encoder. encode(texts, fn) returns one row per text,
+    calling fn(prefixed_texts) -> array only for texts found in neither
+    tier. `disk_dir` enables the on-disk tier under
+    disk_dir/<model>[-<prefix>]/.
+    """
+
+    def __init__(self, model: str, prefix: str = "", maxsize: int = 4096,
+                 disk_dir: Optional[str] = None):
+        self.model = model
+        self.prefix = prefix
+        self._lru = LRUCache(maxsize)
+        self._disk = None
+        if disk_dir:
+            slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model + (f"-{prefix}" if prefix else ""))
+            self._disk = _DiskTier(os.path.join(disk_dir, slug))
+
+    def encode(self, texts: List[str], fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        if not texts:
+            return np.asarray(fn([]), dtype="float32")
+        keys = [text_key(self.prefix + t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        for k in dict.fromkeys(keys):
+            v = self._lru.get(k)
+            if v is not None:
+                found[k] = v
+        n_mem = len(found)
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self._disk is not None:
+            for k, v in self._disk.get_many(missing).items():
+                found[k] = v
+                self._lru.put(k, v)
+        n_disk = len(found) - n_mem
+
+        todo = {}
+        for t, k in zip(texts, keys):
+            if k not in found:
+                todo.setdefault(k, t)
+        if todo:
+            vecs = np.asarray(fn([self.prefix + t for t in todo.values()]), dtype="float32")
+            for k, v in zip(todo, vecs):
+                found[k] = v = np.array(v)   # don't pin the whole batch array
+                self._lru.put(k, v)
+            if self._disk is not None:
+                self._disk.put_many(list(todo), vecs)
+
+        LOOKUPS.inc(n_mem, result="memory")
+        LOOKUPS.inc(n_disk, result="disk")
+        LOOKUPS.inc(len(todo), result="miss")
+        return np.vstack([found[k] for k in keys])
+
+    def info(self) -> Dict[str, object]:
+        return self._lru.info()
@@ -0,0 +1,126 @@
+# src/executor.py
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from . import tracing
+from .metrics import Counter, Gauge, Histogram
+
+QUEUE_WAIT = Histogram("inference_queue_wait_seconds",
+                       "Time a task waited for an inference worker")
+TASK_TIME = Histogram("inference_task_seconds",
+                      "Time spent running a task on an inference worker")
+REJECTED = Counter("inference_rejected_total",
+                   "Tasks refused because the inference queue was full")
+
+
+class QueueFull(RuntimeError):
+    """Raised when the inference backlog is at its limit."""
+
+
+def pin_threads(n: int) -> None:
+    """
+    Cap math-library threads at `n` per call. The env vars only take
+    effect if set before torch/numpy/faiss are imported; libraries that
+    are already loaded are configured directly.
+    """
+    n = max(1, int(n))
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(n))
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(n)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only allowed before the first parallel op
+    faiss = sys.modules.get("faiss")
+    if faiss is not None:
+        faiss.omp_set_num_threads(n)
+
+
+class InferenceExecutor:
+    """
+    Fixed pool of model-serving threads with a bounded backlog.
+
+    Each worker runs one task at a time and torch/OpenMP are capped at
+    `torch_threads` per call, so workers x threads stays near the core
+    count instead of every request thread fanning out across all cores.
+    run() raises QueueFull once `max_queue` tasks are already waiting.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64,
+                 torch_threads: Optional[int] = None, name: str = "infer"):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix=name,
+                                        initializer=pin_threads,
+                                        initargs=(self.torch_threads,))
+        Gauge("inference_queue_depth", "Tasks waiting for an inference worker",
+              fn=lambda: self._queued)
+        Gauge("inference_running", "Tasks running on inference workers",
+              fn=lambda: self._running)
+        Gauge("inference_workers", "Inference worker threads",
+              fn=lambda: self.workers)
+
+    @property
+    def depth(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _task(self, submitted: float, ctx: contextvars.Context, fn: Callable[[], Any]):
+        started = time.perf_counter()
+        QUEUE_WAIT.observe(started - submitted)
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return ctx.run(tracing.run_profiled, fn)
+        finally:
+            with self._lock:
+                self._running -= 1
+            TASK_TIME.observe(time.perf_counter() - started)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on a worker; the caller's contextvars carry over."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                REJECTED.inc()
+                raise QueueFull("inference queue is full")
+            self._queued += 1
+        task = partial(self._task, time.perf_counter(), contextvars.copy_context(),
+                       partial(fn, *args, **kwargs))
+        try:
+            cfut = self._pool.submit(task)
+        except RuntimeError:
+            self._release()  # pool shut down; the task never ran
+            raise
+        cfut.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(cfut)
+
+    def _on_done(self, fut) -> None:
+        # a caller that gives up (wait_for, client gone) cancels the future;
+        # a future only cancels while still queued, so _task never ran to free the slot
+        if fut.cancelled():
+            self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._queued -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,145 @@
+# src/index_io.py
+"""
+Index loading that shares memory between processes.
+
+faiss.read_index() copies an index into each process's private memory,
+so N uvicorn workers hold N copies. Our indexes are exact inner-product
+(IndexFlatIP) over normalized vectors, and the build scripts also save
+the raw vectors as a float32 .npy sidecar. load_index() memory-maps that
+sidecar and searches it with numpy: every worker reads the same
+page-cache pages and opening the index takes no time, whatever its size.
+A missing or stale sidecar is written from the faiss file on first load
+(flat inner-product indexes only); if that isn't possible it falls back
+to faiss (mmap flag first).
+"""
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+# INDEX_MMAP=0 loads every index into private memory with faiss instead
+INDEX_MMAP = os.environ.get("INDEX_MMAP", "1") != "0"
+
+# Rows scored per step in FlatIPIndex.search; bounds the score matrix size
+SEARCH_BLOCK = 262144
+
+_PAD_SCORE = -np.finfo("float32").max   # what faiss reports for missing IP hits
+
+
+def save_vectors(path: str, vecs: np.ndarray) -> None:
+    """Write the sidecar for a flat index: contiguous float32, one row per id."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # write-then-rename: workers exporting at the same time never see half a file
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, np.ascontiguousarray(vecs, dtype="float32"))
+    os.replace(tmp, path)
+
+
+def load_vectors(path: str) -> np.ndarray:
+    """Memory-map a sidecar written by save_vectors() (read-only)."""
+    return np.load(path, mmap_mode="r")
+
+
+class FlatIPIndex:
+    """
+    Exact inner-product search over a (n, d) float32 matrix, typically a
+    read-only memmap. Mirrors the parts of the faiss Index API the
+    pipelines use: d, ntotal, search() and reconstruct_n().
+    """
+
+    def __init__(self, xb: np.ndarray):
+        if xb.ndim != 2:
+            raise ValueError(f"expected a 2-D vector matrix, got shape {xb.shape}")
+        self.xb = xb
+        self.ntotal, self.d = int(xb.shape[0]), int(xb.shape[1])
+
+    def search(self, qvs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        qvs = np.ascontiguousarray(qvs, dtype="float32").reshape(-1, self.d)
+        nq = qvs.shape[0]
+        best_s = np.full((nq, k), _PAD_SCORE, dtype="float32")
+        best_i = np.full((nq, k), -1, dtype="int64")
+        if k <= 0 or self.ntotal == 0:
+            return best_s, best_i
+
+        for start in range(0, self.ntotal, SEARCH_BLOCK):
+            block = np.asarray(self.xb[start:start + SEARCH_BLOCK])
+            scores = qvs @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            # merge this block's scores with the running top-k
+            cand_s = np.concatenate([best_s, scores], axis=1)
+            cand_i = np.concatenate([best_i, ids], axis=1)
+            if cand_s.shape[1] > k:
+                part = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+                cand_s = np.take_along_axis(cand_s, part, axis=1)
+                cand_i = np.take_along_axis(cand_i, part, axis=1)
+            best_s, best_i = cand_s, cand_i
+
+        order = np.argsort(-best_s, axis=1, kind="stable")
+        best_s = np.take_along_axis(best_s, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        return best_s, best_i
+
+    def reconstruct_n(self, i0: int, n: int) -> np.ndarray:
+        return np.asarray(self.xb[i0:i0 + n])
+
+
+def sidecar_usable(index_path: str, vectors_path: Optional[str]) -> bool:
+    """True if `vectors_path` exists and is not older than the faiss file."""
+    if not vectors_path or not os.path.exists(vectors_path):
+        return False
+    # a faiss file rebuilt after the sidecar would no longer match it
+    if os.path.exists(index_path) and \
+            os.path.getmtime(index_path) > os.path.getmtime(vectors_path) + 1.0:
+        return False
+    return True
+
+
+def _export_sidecar(index_path: str, vectors_path: str) -> bool:
+    """Write the sidecar from a flat inner-product faiss file; False if not possible."""
+    try:
+        idx = faiss.read_index(index_path)
+        if not isinstance(idx, faiss.IndexFlat) or idx.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return False
+        save_vectors(vectors_path, idx.reconstruct_n(0, idx.ntotal))
+    except (RuntimeError, OSError) as e:
+        print(f"[WARNING] Could not write {vectors_path}: {e}")
+        return False
+    return True
+
+
+def load_index(index_path: str, vectors_path: Optional[str] = None):
+    """
+    Open a flat inner-product index for search. Prefers a memory-mapped
+    FlatIPIndex over `vectors_path` (written first if missing or stale),
+    then faiss with IO_FLAG_MMAP, then a plain faiss.read_index().
+    """
+    if INDEX_MMAP:
+        if vectors_path and os.path.exists(index_path) and \
+                not sidecar_usable(index_path, vectors_path):
+            _export_sidecar(index_path, vectors_path)
+        if sidecar_usable(index_path, vectors_path):
+            return FlatIPIndex(load_vectors(vectors_path))
+        flag = getattr(faiss, "IO_FLAG_MMAP", None)
+        if flag is not None and os.path.exists(index_path):
+            try:
+                return faiss.read_index(index_path, flag | getattr(faiss, "IO_FLAG_READ_ONLY", 0))
+            except RuntimeError:
+                pass  # this index type can't be mapped; read it normally
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"FAISS index not found at {index_path}")
+    return faiss.read_index(index_path)
+
+
+if __name__ == "__main__":
+    # Write the .npy sidecar for an existing flat index, e.g.
+    #   python -m src.index_io models/faiss_index.bin models/concept_embeddings.npy
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("index", help="faiss index file (flat)")
+    ap.add_argument("vectors", help="sidecar .npy to write")
+    args = ap.parse_args()
+
+    idx = faiss.read_index(args.index)
+    save_vectors(args.vectors, idx.reconstruct_n(0, idx.ntotal))
+    print(f"✅ Saved {idx.ntotal} x {idx.d} vectors to {args.vectors}")
@@ -0,0 +1,159 @@
+# src/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Metrics register themselves on creation; render() produces the body for
+a /metrics endpoint. Creating a metric under an existing name returns
+the existing one, so modules can declare what they need at import time.
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: Dict[str, "_Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __new__(cls, name: str, *args, **kwargs):
+        with _registry_lock:
+            existing = _registry.get(name)
+            if existing is None:
+                existing = _registry[name] = super().__new__(cls)
+            return existing
+
+    def __init__(self, name: str, help: str = "", labels: Sequence[str] = (), **options):
+        if getattr(self, "name", None) is not None:
+            return  # already registered under this name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._setup(**options)
+        self.name = name
+
+    def _setup(self) -> None:
+        pass
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(list(zip(self.labelnames, k)))} {_fmt_value(v)}"
+                for k, v in items]
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from a callback at render time."""
+    kind = "gauge"
+
+    def _setup(self, fn: Optional[Callable[[], float]] = None) -> None:
+        self._fn = fn
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self._fn is not None:
+            return [f"{self.name} {_fmt_value(self._fn())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(list(zip(self.labelnames, k)))} {_fmt_value(v)}"
+                for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def _setup(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, ([*s[0]], s[1], s[2])) for k, s in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for b, c in zip(self.buckets, counts):
+                cumulative += c
+                le = "+Inf" if math.isinf(b) else repr(float(b))
+                lines.append(f"{self.name}_bucket{_fmt_labels(base + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(base)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(base)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format."""
+    with _registry_lock:
+        metrics = [m for m in _registry.values() if getattr(m, "name", None)]
+    return "\n".join(m.render() for m in metrics) + "\n"
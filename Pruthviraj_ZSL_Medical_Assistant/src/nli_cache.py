@@ -0,0 +1,168 @@
+# src/nli_cache.py
+"""
+On-disk cache of NLI entailment scores.
+
+Rows are keyed by (model, premise hash, concept id) and hold the
+(p_entail, margin) pair the NLI model produced. The store is a SQLite
+file in WAL mode, so every uvicorn worker and bulk-scoring process can
+share it: readers don't block each other or the writer. The table is
+trimmed back to `max_rows` least-recently-used rows as it grows, by a
+background thread so no request waits on the delete.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .metrics import Counter
+
+LOOKUPS = Counter("nli_cache_lookups_total", "NLI score cache lookups", labels=("result",))
+
+BUSY_TIMEOUT_MS = 5000   # writes wait this long for another process's lock
+TRIM_CHUNK = 5000        # rows deleted per transaction while trimming
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nli_scores (
+    model   TEXT    NOT NULL,
+    premise TEXT    NOT NULL,
+    concept INTEGER NOT NULL,
+    p_e     REAL    NOT NULL,
+    margin  REAL    NOT NULL,
+    used    REAL    NOT NULL,
+    PRIMARY KEY (model, premise, concept)
+);
+CREATE INDEX IF NOT EXISTS nli_scores_used ON nli_scores (used);
+"""
+
+
+def premise_key(premise: str) -> str:
+    return hashlib.sha1(premise.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # the connection is in autocommit mode (isolation_level=None), where
+    # `with conn:` would commit every statement on its own
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class NLICache:
+    """
+    Thread-safe handle on the score store (one SQLite connection per
+    thread). Storage errors are swallowed: the cache then just misses
+    and inference carries on without it.
+    """
+
+    def __init__(self, path: str, max_rows: int = 1_000_000, trim_every: int = 1000):
+        self.path = path
+        self.max_rows = max(1, int(max_rows))
+        self.trim_every = max(1, int(trim_every))
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn().executescript(_SCHEMA)
+        self._trim_due = threading.Event()
+        threading.Thread(target=self._trim_loop, name="nli-cache-trim", daemon=True).start()
+        self._trim_due.set()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, premise: str,
+                 concepts: Iterable[int]) -> Dict[int, Tuple[float, float]]:
+        """Cached scores for `premise` against each concept id that has one."""
+        concepts = list(dict.fromkeys(int(c) for c in concepts))
+        if not concepts:
+            return {}
+        pk = premise_key(premise)
+        marks = ",".join("?" * len(concepts))
+        try:
+            conn = self._conn()
+            rows = conn.execute(
+                f"SELECT concept, p_e, margin FROM nli_scores "
+                f"WHERE model = ? AND premise = ? AND concept IN ({marks})",
+                (model, pk, *concepts)).fetchall()
+        except sqlite3.Error:
+            rows = []
+        if rows:
+            # recency is best effort: skip it rather than wait for another writer
+            try:
+                conn.execute("PRAGMA busy_timeout = 0")
+                with _transaction(conn):
+                    conn.executemany(
+                        "UPDATE nli_scores SET used = ? WHERE model = ? AND premise = ? AND concept = ?",
+                        [(time.time(), model, pk, r[0]) for r in rows])
+            except sqlite3.Error:
+                pass
+            finally:
+                try:
+                    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+                except sqlite3.Error:
+                    pass
+        LOOKUPS.inc(len(rows), result="hit")
+        LOOKUPS.inc(len(concepts) - len(rows), result="miss")
+        return {c: (p_e, margin) for c, p_e, margin in rows}
+
+    def put_many(self, model: str, rows: List[Tuple[str, int, float, float]]) -> None:
+        """Store (premise, concept id, p_e, margin) rows."""
+        if not rows:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            with _transaction(conn):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO nli_scores VALUES (?, ?, ?, ?, ?, ?)",
+                    [(model, premise_key(p), int(c), float(p_e), float(m), now)
+                     for p, c, p_e, m in rows])
+        except sqlite3.Error:
+            return
+        with self._lock:
+            self._writes += len(rows)
+            due = self._writes >= self.trim_every
+            if due:
+                self._writes = 0
+        if due:
+            self._trim_due.set()
+
+    def _trim_loop(self) -> None:
+        while True:
+            self._trim_due.wait()
+            self._trim_due.clear()
+            self._trim()
+
+    def _trim(self) -> None:
+        try:
+            conn = self._conn()
+            n = conn.execute("SELECT COUNT(*) FROM nli_scores").fetchone()[0]
+            if n <= self.max_rows:
+                return
+            # drop down to 90% so trimming doesn't run on every write; in
+            # chunks, so other writers get the lock in between
+            excess = n - int(self.max_rows * 0.9)
+            while excess > 0:
+                conn.execute(
+                    "DELETE FROM nli_scores WHERE rowid IN "
+                    "(SELECT rowid FROM nli_scores ORDER BY used LIMIT ?)",
+                    (min(excess, TRIM_CHUNK),))
+                excess -= TRIM_CHUNK
+        except sqlite3.Error:
+            pass
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM nli_scores").fetchone()[0]
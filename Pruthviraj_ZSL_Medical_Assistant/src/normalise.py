@@ -2,12 +2,54 @@
 import re
 import csv
 import os
+from typing import List, Optional, Tuple
 from unidecode import unidecode
 from langdetect import detect
 from transformers import pipeline
 
+from . import resources, timing
+from .cache import LRUCache
+from .metrics import Counter, Gauge
+from .phrase_matcher import PhraseMatcher, word_boundary
+
 PHRASEBOOK = os.path.join(os.path.dirname(__file__), '..', 'data', 'phrasebook.csv')
 
+# Note: heavy (600M params). Loaded once per process on first non-English input.
+NLLB_MODEL = "facebook/nllb-200-distilled-600M"
+TRANSLATE_MAX_LEN = 96      # symptom descriptions are a sentence or two
+TRANSLATE_BATCH_SIZE = 8
+
+NORMALIZE_CACHE_SIZE = int(os.environ.get("NORMALIZE_CACHE_SIZE", "4096"))
+
+# langdetect codes -> NLLB codes
+NLLB_LANGS = {
+    "en": "eng_Latn", "hi": "hin_Deva", "mr": "mar_Deva", "ta": "tam_Taml",
+    "te": "tel_Telu", "kn": "kan_Knda", "ml": "mal_Mlym", "bn": "ben_Beng",
+    "gu": "guj_Gujr", "pa": "pan_Guru", "ur": "urd_Arab", "ne": "npi_Deva",
+    "or": "ory_Orya",
+}
+
+# 128-codepoint Unicode blocks -> language (Devanagari is split hi/mr below)
+_SCRIPT_BLOCKS = {
+    0x0900 >> 7: "hi",   # Devanagari
+    0x0980 >> 7: "bn",   # Bengali
+    0x0A00 >> 7: "pa",   # Gurmukhi
+    0x0A80 >> 7: "gu",   # Gujarati
+    0x0B00 >> 7: "or",   # Oriya
+    0x0B80 >> 7: "ta",   # Tamil
+    0x0C00 >> 7: "te",   # Telugu
+    0x0C80 >> 7: "kn",   # Kannada
+    0x0D00 >> 7: "ml",   # Malayalam
+}
+_MARATHI_WORDS = {"आहे", "आणि", "मला", "माझे", "माझा", "माझ्या", "नाही", "खूप", "झाला", "झाले"}
+_ENGLISH_HINTS = {
+    "i", "im", "my", "me", "a", "an", "the", "and", "or", "with", "have", "has",
+    "having", "had", "is", "am", "are", "was", "been", "feel", "feeling", "since",
+    "for", "of", "in", "on", "at", "days", "day", "weeks", "night", "pain",
+    "ache", "fever", "cough", "cold", "headache", "vomiting", "nausea",
+    "severe", "mild", "chest", "throat", "stomach", "breathing", "tired",
+}
+
 def _load_phrasebook():
     mapping = []
     if os.path.exists(PHRASEBOOK):
@@ -21,20 +63,149 @@ def _load_phrasebook():
                     mapping.append((patt.strip(), repl.strip()))
     return mapping
 
-_phrasebook_cache = None
+def _compile_phrasebook(mapping) -> PhraseMatcher:
+    """One word-bounded, case-insensitive automaton over every pattern."""
+    matcher = PhraseMatcher(boundary=word_boundary)
+    for patt, repl in mapping:
+        matcher.add(patt, repl)
+    return matcher.build()
+
+# normalize() results keyed by (raw text, phrasebook version)
+_normalize_cache = LRUCache(NORMALIZE_CACHE_SIZE)
+
+TRANSLATIONS = Counter("translations_total", "Texts sent to the translator", labels=("lang",))
+Gauge("normalize_cache_hit_ratio", "normalize() result cache hit ratio",
+      fn=lambda: _normalize_cache.info()["hit_ratio"])
+
+def _phrasebook_stamp():
+    try:
+        st = os.stat(PHRASEBOOK)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _build_phrasebook():
+    stamp = _phrasebook_stamp()
+    return _compile_phrasebook(_load_phrasebook()), stamp
+
+def _build_translator():
+    return pipeline("translation", model=NLLB_MODEL)
+
+resources.register("normalise.phrasebook", _build_phrasebook)
+resources.register("normalise.translator", _build_translator)
+
+def _get_phrasebook():
+    """
+    Compiled phrasebook and its version stamp. Recompiled whenever
+    phrasebook.csv changes on disk, which also drops cached normalize()
+    results built from the old version.
+    """
+    matcher, version = resources.get("normalise.phrasebook")
+    if _phrasebook_stamp() != version:
+        resources.invalidate("normalise.phrasebook")
+        _normalize_cache.clear()
+        matcher, version = resources.get("normalise.phrasebook")
+    return matcher, version
+
+def version():
+    """Identifies what normalize() output depends on (for cache keys)."""
+    return (NLLB_MODEL, TRANSLATE_MAX_LEN, _phrasebook_stamp())
+
+def normalize_cache_info():
+    """Hit/miss counters and size of the normalize() result cache."""
+    return _normalize_cache.info()
+
+def _load_translator():
+    return resources.get("normalise.translator")
+
+def translate_many(texts: List[str], src_lang: str,
+                   max_length: int = TRANSLATE_MAX_LEN) -> List[str]:
+    """
+    Translate texts in `src_lang` to English in one batched call.
+    Generation is capped by input length (and `max_length`), so short
+    symptom strings don't pay for long decodes. On failure the inputs are
+    returned unchanged.
+    """
+    texts = list(texts)
+    out = _translate_many(texts, src_lang, max_length)
+    return texts if out is None else out
 
-def translate_if_needed(text: str) -> str:
+def _translate_many(texts: List[str], src_lang: str,
+                    max_length: int = TRANSLATE_MAX_LEN) -> Optional[List[str]]:
+    """translate_many(), but None on failure."""
+    if not texts:
+        return []
+    longest = max(len(t.split()) for t in texts)
+    TRANSLATIONS.inc(len(texts), lang=src_lang)
     try:
-        lang = detect(text)
-        if lang != "en":
-            # Use NLLB distilled model - note: heavy. In low-resource deployment, consider a lightweight translator or skip.
-            translator = pipeline("translation", model="facebook/nllb-200-distilled-600M")
-            translated = translator(text, src_lang=lang, tgt_lang="eng_Latn")[0]["translation_text"]
-            return translated
-        return text
+        translator = _load_translator()
+        with timing.stage("translate"):
+            outs = translator(
+                texts,
+                src_lang=NLLB_LANGS.get(src_lang, src_lang),
+                tgt_lang="eng_Latn",
+                max_length=min(max_length, 16 + 3 * longest),
+                batch_size=TRANSLATE_BATCH_SIZE,
+            )
+        return [o["translation_text"] for o in outs]
     except Exception as e:
         print(f"[WARNING] Translation failed: {e}")
-        return text
+        return None
+
+def warmup(translator: bool = True) -> None:
+    """Compile the phrasebook and, optionally, load and exercise the translator."""
+    _get_phrasebook()
+    if translator:
+        translate_many(["मुझे बुखार है"], "hi")
+
+def detect_language(text: str) -> Optional[str]:
+    """
+    Fast language guess from the script of the letters in `text`.
+    Indic scripts are decided directly, and Latin text made up mostly of
+    common English words is "en". Anything else (romanized Hindi, other
+    Latin languages, unknown scripts) falls back to langdetect.
+    Returns None when no language can be determined.
+    """
+    if not text:
+        return None
+    counts = {}
+    latin = other = 0
+    for ch in text:
+        o = ord(ch)
+        if o < 0x250:
+            if ch.isalpha():
+                latin += 1
+            continue
+        lang = _SCRIPT_BLOCKS.get(o >> 7)
+        if lang:
+            counts[lang] = counts.get(lang, 0) + 1
+        elif ch.isalpha():
+            other += 1
+
+    if counts:
+        lang = max(counts, key=counts.get)
+        if counts[lang] >= latin + other:
+            if lang == "hi" and ("ळ" in text or
+                                 _MARATHI_WORDS.intersection(re.split(r"[\s,.!?।]+", text))):
+                return "mr"
+            return lang
+    elif latin and not other:
+        words = re.findall(r"[a-z]+", text.lower())
+        if words and 2 * sum(w in _ENGLISH_HINTS for w in words) >= len(words):
+            return "en"
+
+    try:
+        with timing.stage("langdetect"):
+            return detect(text)
+    except Exception:
+        return None
+
+def translate_if_needed(text: str, lang: Optional[str] = None) -> str:
+    if lang is None:
+        lang = detect_language(text)
+    if lang and lang != "en":
+        return translate_many([text], lang)[0]
+    return text
 
 def normalize(text: str) -> str:
     """
@@ -43,36 +214,61 @@ def normalize(text: str) -> str:
     - ascii transliteration
     - collapse whitespace and repeated chars
     - translate if non-English and phrasebook doesn't match
+    Results are cached per raw text and phrasebook version (LRU).
     """
-    global _phrasebook_cache
-    if _phrasebook_cache is None:
-        _phrasebook_cache = _load_phrasebook()
+    return normalize_many([text])[0]
 
-    # Basic guard
-    if not isinstance(text, str):
-        return ""
+def normalize_many(texts: List[str]) -> List[str]:
+    """
+    normalize() over a batch. Cache misses that need translation are
+    sent to the translator together, one call per source language.
+    """
+    return normalize_many_checked(texts)[0]
 
-    # Only translate if language is not English and phrasebook doesn't cover it
-    lang = None
-    try:
-        lang = detect(text)
-    except Exception:
-        lang = None
+def normalize_many_checked(texts: List[str]) -> Tuple[List[str], List[bool]]:
+    """
+    normalize_many(), plus a flag per text: False where translation
+    failed and the untranslated text was normalized instead. Those
+    results are not cached, so the next call tries the translator again.
+    """
+    with timing.stage("normalize"):
+        return _normalize_many(texts)
 
-    t = text
-    if lang and lang != "en":
-        # Check if phrasebook has a direct match before translating
-        found_in_phrasebook = False
-        for patt, _ in _phrasebook_cache:
-            try:
-                if re.search(rf'\b{re.escape(patt)}\b', t, flags=re.IGNORECASE):
-                    found_in_phrasebook = True
-                    break
-            except re.error:
-                continue
-        if not found_in_phrasebook:
-            t = translate_if_needed(text)
+def _normalize_many(texts: List[str]) -> Tuple[List[str], List[bool]]:
+    phrasebook, version = _get_phrasebook()
+    out: List[Optional[str]] = [None] * len(texts)
+    ok = [True] * len(texts)
+    todo = {}   # source language (None = no translation) -> indices
+
+    for i, text in enumerate(texts):
+        # Basic guard
+        if not isinstance(text, str):
+            out[i] = ""
+            continue
+        cached = _normalize_cache.get((text, version))
+        if cached is not None:
+            out[i] = cached
+            continue
+        # Only translate if language is not English and phrasebook doesn't cover it
+        lang = detect_language(text)
+        if not (lang and lang != "en") or phrasebook.search(text):
+            lang = None
+        todo.setdefault(lang, []).append(i)
+
+    for lang, idxs in todo.items():
+        sources = [texts[i] for i in idxs]
+        translated = _translate_many(sources, lang) if lang else sources
+        if translated is None:
+            translated = sources
+            for i in idxs:
+                ok[i] = False
+        for i, t in zip(idxs, translated):
+            out[i] = _clean(texts[i], t, phrasebook)
+            if ok[i]:
+                _normalize_cache.put((texts[i], version), out[i])
+    return out, ok
 
+def _clean(text: str, t: str, phrasebook: PhraseMatcher) -> str:
     # Basic cleaning
     t_clean = t.strip()
     t_clean = t_clean.replace('\u200d', ' ')
@@ -81,18 +277,8 @@ def normalize(text: str) -> str:
     t_clean = re.sub(r'(.)\1{2,}', r'\1\1', t_clean, flags=re.IGNORECASE)
     t_ascii = unidecode(t_clean)
 
-    # Phrasebook replacements
-    def apply_map(s):
-        s2 = s
-        for patt, repl in _phrasebook_cache:
-            try:
-                s2 = re.sub(rf'\b{re.escape(patt)}\b', repl, s2, flags=re.IGNORECASE)
-            except re.error:
-                # if a phrasebook pattern contains regex meta, skip it safely
-                continue
-        return s2
-
-    t_final = apply_map(t_clean)
-    t_ascii_final = apply_map(t_ascii)
+    # Phrasebook replacements (one pass each; longest pattern wins on overlap)
+    t_final = phrasebook.sub(t_clean)
+    t_ascii_final = phrasebook.sub(t_ascii)
 
     return t_ascii_final if t_ascii_final != unidecode(text) else t_final
@@ -0,0 +1,149 @@
+# src/phrase_matcher.py
+"""
+Aho-Corasick matcher for large phrase lists.
+
+Phrases are added once and compiled into an automaton; every occurrence
+in a text is then found in a single left-to-right pass, independent of
+how many phrases are loaded. A boundary rule decides which occurrences
+count, so the same automaton can replace the per-phrase regexes used for
+concept matching ((?<![a-z0-9])...(?![a-z0-9])) and for the phrasebook
+(\\b...\\b).
+"""
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+
+def _is_alnum(ch: str) -> bool:
+    return ("a" <= ch <= "z") or ("0" <= ch <= "9")
+
+
+def _is_word(ch: str) -> bool:
+    # same character class as re's Unicode \w
+    return ch.isalnum() or ch == "_"
+
+
+def alnum_boundary(text: str, start: int, end: int) -> bool:
+    """Equivalent of (?<![a-z0-9])phrase(?![a-z0-9])."""
+    if start > 0 and _is_alnum(text[start - 1]):
+        return False
+    if end < len(text) and _is_alnum(text[end]):
+        return False
+    return True
+
+
+def word_boundary(text: str, start: int, end: int) -> bool:
+    """Equivalent of \\bphrase\\b."""
+    def at(i: int) -> bool:
+        before = i > 0 and _is_word(text[i - 1])
+        after = i < len(text) and _is_word(text[i])
+        return before != after
+    return at(start) and at(end)
+
+
+class PhraseMatcher:
+    """
+    Case-insensitive multi-phrase matcher.
+
+    Each phrase carries a value (a concept index, a replacement string...).
+    Call build() after the last add(); lookups build lazily otherwise.
+    """
+
+    def __init__(self, boundary: Callable[[str, int, int], bool] = alnum_boundary):
+        self._boundary = boundary
+        self._goto: List[Dict[str, int]] = [{}]
+        self._own: List[List[Tuple[int, Any]]] = [[]]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self._built = True
+        self.size = 0
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        low = text.lower()
+        if len(low) == len(text):
+            return low
+        # a few characters lower-case to two code points; keep offsets aligned
+        return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+    def add(self, phrase: str, value: Any) -> None:
+        phrase = self._fold(phrase or "")
+        if not phrase:
+            return
+        node = 0
+        for ch in phrase:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._own.append([])
+            node = nxt
+        self._own[node].append((len(phrase), value))
+        self._built = False
+        self.size += 1
+
+    def build(self) -> "PhraseMatcher":
+        n = len(self._goto)
+        self._fail = [0] * n
+        self._out = [list(o) for o in self._own]
+
+        # breadth-first, so a node's failure target is complete before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+        self._built = True
+        return self
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every occurrence, overlaps included."""
+        if not self._built:
+            self.build()
+        t = self._fold(text or "")
+        goto, fail, out, ok = self._goto, self._fail, self._out, self._boundary
+        node = 0
+        for i, ch in enumerate(t):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                start = i + 1 - length
+                if ok(t, start, i + 1):
+                    yield start, i + 1, value
+
+    def values(self, text: str) -> Set[Any]:
+        return {value for _, _, value in self.finditer(text)}
+
+    def search(self, text: str) -> bool:
+        for _ in self.finditer(text):
+            return True
+        return False
+
+    def sub(self, text: str) -> str:
+        """Replace leftmost-longest, non-overlapping matches with their value."""
+        best: Dict[int, Tuple[int, Any]] = {}
+        for start, end, value in self.finditer(text):
+            cur = best.get(start)
+            if cur is None or end > cur[0]:
+                best[start] = (end, value)
+        if not best:
+            return text
+
+        parts = []
+        pos = 0
+        for start in sorted(best):
+            if start < pos:
+                continue
+            end, value = best[start]
+            parts.append(text[pos:start])
+            parts.append(str(value))
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts)
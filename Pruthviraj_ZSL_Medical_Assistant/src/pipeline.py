@@ -1,17 +1,26 @@
 # src/pipeline.py
 import os
-import re
+import sys
 import json
+import time
 import argparse
-from typing import List, Dict, Any, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 
-import faiss
 import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-from .normalise import normalize
+from . import resources, timing
+from .embed_cache import EmbeddingCache
+from .index_io import FlatIPIndex, load_index, load_vectors, sidecar_usable
+from .metrics import Counter, Histogram
+from .nli_cache import NLICache
+from .normalise import normalize_many_checked
+from .phrase_matcher import PhraseMatcher, alnum_boundary
 from .triage import simple_triage
 from .recommend import recommend_specialists, recommend_tests
 
@@ -19,6 +28,7 @@ from .recommend import recommend_specialists, recommend_tests
 ROOT = os.path.dirname(os.path.dirname(__file__))
 CONCEPTS = os.path.join(ROOT, "data", "concepts.jsonl")
 INDEX = os.path.join(ROOT, "models", "faiss_index.bin")
+CONCEPT_EMBS = os.path.join(ROOT, "models", "concept_embeddings.npy")
 
 # -------- Models (LIGHTWEIGHT VERSIONS) --------
 EMB_MODEL = "intfloat/multilingual-e5-base"  
@@ -31,49 +41,123 @@ LEXICAL_BOOST = 0.35
 MARGIN_MIN = 0.15
 STRICT_EXACT_WINS = True
 TOPK = 30
+NLI_BATCH_SIZE = 16
+NLI_CASCADE = True
+# Skip NLI once exact matches fill topn. Not exact: an entailment score
+# above the 0.999 exact-match score would have ranked higher. Opt-in.
+NLI_TOPN_CUT = False
+
+# Query/passage embeddings: EMBED_CACHE_SIZE in memory, plus an on-disk tier
+# under EMBED_CACHE_DIR if set. EMB_PREFIX is prepended to every text encoded.
+EMB_PREFIX = ""
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_DIR = os.environ.get("EMBED_CACHE_DIR", "")
+
+# On-disk NLI score cache shared by all processes; NLI_CACHE_PATH="" disables it
+NLI_CACHE_PATH = os.environ.get("NLI_CACHE_PATH", os.path.join(ROOT, "models", "nli_cache.sqlite3"))
+NLI_CACHE_MAX_ROWS = int(os.environ.get("NLI_CACHE_MAX_ROWS", "1000000"))
+
+# Sent through the full pipeline by warmup()
+WARMUP_TEXTS = [
+    "I have fever and a bad cough since two days",
+    "chest pain with sweating and shortness of breath",
+    "headache",
+]
+
+NLI_PAIRS = Counter("nli_pairs_scored_total", "Premise/hypothesis pairs run through the NLI model")
+NLI_PER_QUERY = Histogram("nli_pairs_per_query", "Candidates sent to NLI per query",
+                          buckets=(0, 1, 2, 5, 10, 20, 30, 50))
 
-# -------- Globals --------
-_enc = None
-_index = None
-_concepts = None
-_tokenizer = None
-_nli = None
 _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # -------------------------
 # Loaders
 # -------------------------
+# Built once per process through the shared resource registry, so
+# concurrent first requests wait for one load instead of each loading
+# their own copy.
+def _build_enc() -> SentenceTransformer:
+    return SentenceTransformer(EMB_MODEL)
+
+def _build_index():
+    # memory-mapped from the concept_embeddings.npy sidecar when it is there
+    return load_index(INDEX, CONCEPT_EMBS)
+
+def _build_concepts() -> List[Dict[str, Any]]:
+    if not os.path.exists(CONCEPTS):
+        raise FileNotFoundError(f"Concepts file missing at {CONCEPTS}")
+    with open(CONCEPTS, "r", encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+def _build_concept_embs() -> np.ndarray:
+    n = len(_load_concepts())
+    embs = None
+    idx = _load_index()   # writes a missing or stale sidecar when it can
+    if isinstance(idx, FlatIPIndex):
+        embs = idx.xb     # the very vectors search uses
+    elif sidecar_usable(INDEX, CONCEPT_EMBS):
+        embs = load_vectors(CONCEPT_EMBS)
+    else:
+        try:
+            embs = idx.reconstruct_n(0, idx.ntotal)
+        except RuntimeError:
+            embs = None
+    if embs is None or embs.ndim != 2 or embs.shape[0] != n:
+        embs = np.zeros((0, 0), dtype="float32")
+    return embs
+
+def _build_nli():
+    tokenizer = AutoTokenizer.from_pretrained(NLI_MODEL, use_fast=False)
+    tokenizer.model_max_length = MAX_LEN
+    nli = AutoModelForSequenceClassification.from_pretrained(NLI_MODEL).to(_device)
+    nli.eval()
+    return tokenizer, nli
+
+def _build_nli_cache() -> Optional[NLICache]:
+    if not NLI_CACHE_PATH:
+        return None
+    try:
+        return NLICache(NLI_CACHE_PATH, max_rows=NLI_CACHE_MAX_ROWS)
+    except Exception as e:
+        print(f"[WARNING] NLI cache disabled: {e}")
+        return None
+
+def _build_embed_cache() -> EmbeddingCache:
+    return EmbeddingCache(EMB_MODEL, prefix=EMB_PREFIX, maxsize=EMBED_CACHE_SIZE,
+                          disk_dir=EMBED_CACHE_DIR or None)
+
+resources.register("pipeline.encoder", _build_enc)
+resources.register("pipeline.embed_cache", _build_embed_cache)
+resources.register("pipeline.index", _build_index)
+resources.register("pipeline.concepts", _build_concepts)
+resources.register("pipeline.concept_embs", _build_concept_embs)
+resources.register("pipeline.nli", _build_nli)
+resources.register("pipeline.nli_cache", _build_nli_cache)
+
 def _load_enc() -> SentenceTransformer:
-    global _enc
-    if _enc is None:
-        _enc = SentenceTransformer(EMB_MODEL)
-    return _enc
+    return resources.get("pipeline.encoder")
 
 def _load_index():
-    global _index
-    if _index is None:
-        if not os.path.exists(INDEX):
-            raise FileNotFoundError(f"FAISS index not found at {INDEX}")
-        _index = faiss.read_index(INDEX)
-    return _index
+    return resources.get("pipeline.index")
 
 def _load_concepts() -> List[Dict[str, Any]]:
-    global _concepts
-    if _concepts is None:
-        if not os.path.exists(CONCEPTS):
-            raise FileNotFoundError(f"Concepts file missing at {CONCEPTS}")
-        with open(CONCEPTS, "r", encoding="utf-8") as f:
-            _concepts = [json.loads(l) for l in f if l.strip()]
-    return _concepts
+    return resources.get("pipeline.concepts")
+
+def _load_concept_embs() -> Optional[np.ndarray]:
+    """
+    Passage embeddings of every concept ("{label}. {description}"), row i
+    matching concepts.jsonl line i. Prefers the memory-mapped matrix saved
+    by build_index.py and falls back to the vectors stored in the flat
+    FAISS index. Returns None if neither lines up with the concepts file.
+    """
+    embs = resources.get("pipeline.concept_embs")
+    return embs if embs.size else None
 
 def _load_nli():
-    global _tokenizer, _nli
-    if _nli is None:
-        _tokenizer = AutoTokenizer.from_pretrained(NLI_MODEL, use_fast=False)
-        _tokenizer.model_max_length = MAX_LEN
-        _nli = AutoModelForSequenceClassification.from_pretrained(NLI_MODEL).to(_device)
-        _nli.eval()
-    return _tokenizer, _nli
+    return resources.get("pipeline.nli")
+
+def _load_nli_cache() -> Optional[NLICache]:
+    return resources.get("pipeline.nli_cache")
 
 # -------------------------
 # Lexical helper
@@ -91,44 +175,52 @@ def _collect_phrases_for_concept(c: Dict[str, Any]) -> List[str]:
             phrases.append(s.strip().lower())
     return list(dict.fromkeys(phrases))
 
-def _lexical_hits(text: str, concepts: List[Dict[str, Any]]) -> Dict[int, float]:
-    hits = {}
-    t = text.lower()
-    for idx, c in enumerate(concepts):
-        phrases = _collect_phrases_for_concept(c)
-        for p in phrases:
-            if not p:
-                continue
-            pat = rf"(?<![a-z0-9]){re.escape(p)}(?![a-z0-9])"
-            if re.search(pat, t):
-                hits[idx] = max(hits.get(idx, 0.0), LEXICAL_BOOST)
-    return hits
+def _build_lexicon() -> PhraseMatcher:
+    matcher = PhraseMatcher(boundary=alnum_boundary)
+    for idx, c in enumerate(_load_concepts()):
+        for p in _collect_phrases_for_concept(c):
+            matcher.add(p, idx)
+    return matcher.build()
+
+resources.register("pipeline.lexicon", _build_lexicon)
+
+def _load_lexicon() -> PhraseMatcher:
+    """Automaton over every concept label and synonym -> concept index."""
+    return resources.get("pipeline.lexicon")
+
+def _lexical_hits(text: str, concepts: Optional[List[Dict[str, Any]]] = None) -> Dict[int, float]:
+    # one pass over the text; same word-boundary rule as
+    # (?<![a-z0-9])phrase(?![a-z0-9]) on the lower-cased text
+    lexicon = _load_lexicon()
+    with timing.stage("lexical"):
+        return {idx: LEXICAL_BOOST for idx in lexicon.values(text.lower())}
 
 # -------------------------
 # Embedding + Retrieval
 # -------------------------
-def _embed(texts: List[str]) -> np.ndarray:
+def _encode(texts: List[str]) -> np.ndarray:
     enc = _load_enc()
-    vecs = enc.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    with timing.stage("encode"):
+        vecs = enc.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
     return vecs.astype("float32")
 
-def _retrieve(user_text: str, k: int = TOPK, debug: bool = False):
-    idx = _load_index()
-    concepts = _load_concepts()
-
-    qv = _embed([user_text])
-    sims, ids = idx.search(qv, k)
+def _embed(texts: List[str]) -> np.ndarray:
+    """Normalized embeddings, one row per text, through the embedding cache."""
+    cache = resources.get("pipeline.embed_cache")
+    with timing.stage("embed"):
+        return cache.encode(list(texts), _encode)
 
+def _rerank(qv: np.ndarray, ids: np.ndarray, sims: np.ndarray,
+            lex_hits: Dict[int, float], concepts: List[Dict[str, Any]]):
     coarse = []
     seen = set()
 
-    for i, s in zip(ids[0], sims[0]):
+    for i, s in zip(ids, sims):
         if 0 <= i < len(concepts) and i not in seen:
             coarse.append((i, float(s)))
             seen.add(i)
 
     # lexical boost
-    lex_hits = _lexical_hits(user_text, concepts)
     for i, boost in lex_hits.items():
         if i not in seen:
             coarse.append((i, 0.0))
@@ -137,18 +229,16 @@ def _retrieve(user_text: str, k: int = TOPK, debug: bool = False):
     if not coarse:
         return []
 
-    enc = _load_enc()
-    query_emb = enc.encode(user_text, convert_to_tensor=True, normalize_embeddings=True)
-
-    cand_strings = []
-    ids_order = []
-    for cid, _ in coarse:
-        c = concepts[cid]
-        cand_strings.append(f"{c.get('label','')}. {c.get('description','')}")
-        ids_order.append(cid)
-
-    cand_embs = enc.encode(cand_strings, convert_to_tensor=True, normalize_embeddings=True)
-    cos_scores = util.cos_sim(query_emb, cand_embs)[0].cpu().numpy()
+    ids_order = [cid for cid, _ in coarse]
+    cand_embs = _load_concept_embs()
+    if cand_embs is not None:
+        cand_embs = np.asarray(cand_embs[ids_order], dtype="float32")
+    else:
+        cand_embs = _embed([
+            f"{concepts[cid].get('label','')}. {concepts[cid].get('description','')}"
+            for cid in ids_order
+        ])
+    cos_scores = cand_embs @ qv
 
     merged = []
     for cid, cos_score in zip(ids_order, cos_scores):
@@ -156,51 +246,191 @@ def _retrieve(user_text: str, k: int = TOPK, debug: bool = False):
         merged.append((cid, total_score))
 
     merged.sort(key=lambda x: -x[1])
-    return [(concepts[cid], score) for cid, score in merged]
+    return [(cid, concepts[cid], score) for cid, score in merged]
+
+def _retrieve_batch(qvs: np.ndarray, lex_hits: List[Dict[int, float]], k: int = TOPK):
+    """One FAISS search for a (n, d) block of query vectors, reranked per row."""
+    idx = _load_index()
+    concepts = _load_concepts()
+    with timing.stage("retrieve"):
+        with timing.stage("faiss_search"):
+            sims, ids = idx.search(qvs, k)
+        with timing.stage("rerank"):
+            return [_rerank(qvs[r], ids[r], sims[r], lex_hits[r], concepts)
+                    for r in range(len(qvs))]
+
+def _retrieve(user_text: str, k: int = TOPK, debug: bool = False,
+              qv: Optional[np.ndarray] = None,
+              lex_hits: Optional[Dict[int, float]] = None):
+    """Return (concept index, concept, score) triples, best first."""
+    if qv is None:
+        qv = _embed([user_text])
+    if lex_hits is None:
+        lex_hits = _lexical_hits(user_text)
+    return _retrieve_batch(qv, [lex_hits], k=k)[0]
+
+# -------------------------
+# Query context
+# -------------------------
+class QueryContext:
+    """
+    One request's raw text, its normalized premise and the premise
+    embedding. The embedding is computed on first use and then shared by
+    FAISS retrieval, the cosine rerank and the disease index search.
+    """
+
+    def __init__(self, text: str, premise: Optional[str] = None,
+                 translated: bool = True):
+        self.text = text
+        if premise is None:
+            (premise,), (translated,) = normalize_many_checked([text])
+        self.premise = premise
+        # False if translation failed and the premise is the untranslated text
+        self.translated = translated
+        self._qv: Optional[np.ndarray] = None
+
+    @property
+    def qv(self) -> np.ndarray:
+        if self._qv is None:
+            self._qv = _embed([self.premise])
+        return self._qv
+
+def embed_queries(queries: List[QueryContext]) -> None:
+    """Embed every query that has no vector yet, in one encoder call."""
+    missing = [q for q in queries if q._qv is None]
+    if missing:
+        vecs = _embed([q.premise for q in missing])
+        for q, row in zip(missing, vecs):
+            q._qv = row[None, :]
+
+def make_queries(texts: List[str], embed: bool = True) -> List[QueryContext]:
+    """Normalize and (unless embed=False) embed a batch of texts."""
+    premises, translated = normalize_many_checked(texts)
+    queries = [QueryContext(t, p, ok) for t, p, ok in zip(texts, premises, translated)]
+    if embed:
+        embed_queries(queries)
+    return queries
 
 # -------------------------
 # NLI / Entailment
 # -------------------------
-def _entailment_full(premise: str, hypothesis: str):
+def _entailment_batch(pairs: List[Tuple[str, str]],
+                      batch_size: int = NLI_BATCH_SIZE) -> List[Tuple[float, float]]:
+    """
+    Score (premise, hypothesis) pairs in padded batches.
+    Pairs are tokenized once and grouped by token length so each batch
+    pads to a similar size; results come back in the input order.
+    """
+    if not pairs:
+        return []
     tok, nli = _load_nli()
-    xs = tok(premise, hypothesis, return_tensors="pt",
-             truncation=True, max_length=MAX_LEN).to(_device)
-    with torch.no_grad():
-        logits = nli(**xs).logits.softmax(-1)[0].cpu().numpy()
+    NLI_PAIRS.inc(len(pairs))
+    with timing.stage("nli"):
+        enc = tok([p for p, _ in pairs], [h for _, h in pairs],
+                  truncation=True, max_length=MAX_LEN)
+
+        order = sorted(range(len(pairs)), key=lambda i: len(enc["input_ids"][i]))
+        out: List[Tuple[float, float]] = [(0.0, 0.0)] * len(pairs)
+        step = max(1, int(batch_size))
+
+        for start in range(0, len(order), step):
+            chunk = order[start:start + step]
+            feats = {key: [enc[key][i] for i in chunk] for key in enc.keys()}
+            xs = tok.pad(feats, padding=True, return_tensors="pt").to(_device)
+            with torch.no_grad():
+                probs = nli(**xs).logits.softmax(-1).cpu().numpy()
+
+            # contradiction / neutral / entailment
+            for i, row in zip(chunk, probs):
+                p_c, p_n, p_e = float(row[0]), float(row[1]), float(row[2])
+                out[i] = (p_e, p_e - max(p_c, p_n))
+    return out
 
-    # contradiction / neutral / entailment
-    p_c, p_n, p_e = float(logits[0]), float(logits[1]), float(logits[2])
-    margin = p_e - max(p_c, p_n)
-    return p_e, margin
+def _entailment_full(premise: str, hypothesis: str):
+    return _entailment_batch([(premise, hypothesis)])[0]
+
+def _hypothesis(c: Dict[str, Any]) -> str:
+    return f"The patient has {c.get('label', '')}."
+
+def _nli_cache_model() -> str:
+    # concept ids are only meaningful for one version of concepts.jsonl
+    return f"{NLI_MODEL}|{MAX_LEN}|{resources.file_stamp(CONCEPTS)}"
+
+def _entailment_cached(items: List[Tuple[str, int, Dict[str, Any]]],
+                       batch_size: int = NLI_BATCH_SIZE) -> List[Tuple[float, float]]:
+    """
+    Entailment scores for (premise, concept id, concept) items. Pairs
+    found in the NLI score cache skip the model; the rest go through
+    _entailment_batch() and are written back.
+    """
+    cache = _load_nli_cache()
+    if cache is None:
+        return _entailment_batch([(p, _hypothesis(c)) for p, _, c in items], batch_size)
+
+    model = _nli_cache_model()
+    out: List[Optional[Tuple[float, float]]] = [None] * len(items)
+    by_premise: Dict[str, List[int]] = {}
+    for j, (p, _, _) in enumerate(items):
+        by_premise.setdefault(p, []).append(j)
+    for p, js in by_premise.items():
+        hits = cache.get_many(model, p, [items[j][1] for j in js])
+        for j in js:
+            out[j] = hits.get(items[j][1])
+
+    miss = [j for j, o in enumerate(out) if o is None]
+    scores = _entailment_batch([(items[j][0], _hypothesis(items[j][2])) for j in miss],
+                               batch_size)
+    for j, score in zip(miss, scores):
+        out[j] = score
+    cache.put_many(model, [(items[j][0], items[j][1], *out[j]) for j in miss])
+    return out
 
 # -------------------------
 # Inference
 # -------------------------
-def infer(text: str, k: int = TOPK, threshold: float = 0.75,
-          topn: int = 5, debug: bool = False):
-
-    premise = normalize(text)
-    concepts = _load_concepts()
-    cands = _retrieve(premise, k=k, debug=debug)
-
+def version() -> tuple:
+    """
+    Everything that changes infer() output for a given premise: model
+    names, tunables and the on-disk index/concept files.
+    """
+    return (EMB_MODEL, NLI_MODEL, MAX_LEN, RETR_SIM_MIN, LEXICAL_BOOST,
+            MARGIN_MIN, STRICT_EXACT_WINS, NLI_CASCADE, NLI_TOPN_CUT,
+            resources.file_stamp(INDEX), resources.file_stamp(CONCEPTS),
+            resources.file_stamp(CONCEPT_EMBS))
+
+def _nli_plan(cands, lexical: List[bool], topn: int, cascade: bool):
+    """Indices of candidates to send to NLI, and how many would go without the cascade."""
+    # every candidate without an exact match
+    pending = [i for i, lex in enumerate(lexical)
+               if not (STRICT_EXACT_WINS and lex)]
+    nli_needed = len(pending)
+    if cascade:
+        # rows under RETR_SIM_MIN are dropped after scoring anyway
+        pending = [i for i in pending if cands[i][2] >= RETR_SIM_MIN]
+    if cascade and NLI_TOPN_CUT:
+        # once exact matches (score 0.999) fill topn an entailment score
+        # would have to beat 0.999 to be returned
+        exact = sum(1 for i, lex in enumerate(lexical)
+                    if lex and cands[i][2] >= RETR_SIM_MIN)
+        if STRICT_EXACT_WINS and exact >= topn:
+            pending = []
+    return pending, nli_needed
+
+def _finalize(premise: str, cands, lexical: List[bool],
+              nli_scores: Dict[int, Tuple[float, float]],
+              threshold: float, topn: int, use_nli: bool = True) -> Dict[str, Any]:
     scored = []
-    for c, retr in cands:
+    for i, (_, c, retr) in enumerate(cands):
         label = c.get("label", "")
-        hyp = f"The patient has {label}."
-
-        phrases = _collect_phrases_for_concept(c)
-        lexical_present = any(
-            re.search(rf"(?<![a-z0-9]){re.escape(p)}(?![a-z0-9])",
-                      premise.lower()) for p in phrases
-        )
+        lexical_present = lexical[i]
 
         if STRICT_EXACT_WINS and lexical_present:
             p_e, margin = 0.999, 0.999
+        elif not use_nli:
+            # retrieval-only mode: the rerank score stands in for entailment
+            p_e, margin = retr, MARGIN_MIN
         else:
-            try:
-                p_e, margin = _entailment_full(premise, hyp)
-            except:
-                p_e, margin = retr, 0.0
+            p_e, margin = nli_scores.get(i, (retr, 0.0))
 
         if lexical_present or (p_e >= threshold and margin >= MARGIN_MIN):
             scored.append({
@@ -216,15 +446,17 @@ def infer(text: str, k: int = TOPK, threshold: float = 0.75,
     keep = filtered[:topn]
 
     # enrich
-    for p in keep:
-        try:
-            p["specialists"] = recommend_specialists(p["label"])
-            p["recommended_tests"] = recommend_tests(p["label"])
-        except:
-            p["specialists"] = []
-            p["recommended_tests"] = []
+    with timing.stage("recommend"):
+        for p in keep:
+            try:
+                p["specialists"] = recommend_specialists(p["label"])
+                p["recommended_tests"] = recommend_tests(p["label"])
+            except:
+                p["specialists"] = []
+                p["recommended_tests"] = []
 
-    triage = simple_triage([s["label"] for s in keep], premise)
+    with timing.stage("triage"):
+        triage = simple_triage([s["label"] for s in keep], premise)
 
     return {
         "normalized_text": premise,
@@ -233,11 +465,309 @@ def infer(text: str, k: int = TOPK, threshold: float = 0.75,
         "disclaimer": "Informational only; not a medical diagnosis."
     }
 
+def infer_batch(texts: List[str], k: int = TOPK, threshold: float = 0.75,
+                topn: int = 5, debug: bool = False,
+                queries: Optional[List[QueryContext]] = None,
+                cascade: bool = NLI_CASCADE,
+                use_nli: bool = True) -> List[Dict[str, Any]]:
+    """
+    infer() over many texts. Normalization, query embedding, the FAISS
+    search and NLI each run once for the whole batch; returns one
+    infer()-style dict per text, in order.
+    use_nli=False skips the entailment model and ranks candidates by
+    retrieval score alone (the server's degraded mode).
+    If NLI fails for a text, its candidates fall back to their retrieval
+    scores and its result carries nli_degraded=True; a text whose
+    translation failed carries translation_failed=True.
+    With debug=True each result carries debug["timing_ms"], the time
+    per pipeline stage for the whole batch.
+    """
+    if not debug:
+        return _infer_batch(texts, k, threshold, topn, False, queries, cascade, use_nli)
+    with timing.collect() as totals:
+        results = _infer_batch(texts, k, threshold, topn, True, queries, cascade, use_nli)
+    breakdown = timing.as_ms(totals)
+    for out in results:
+        out["debug"]["timing_ms"] = breakdown
+    return results
+
+def _infer_batch(texts, k, threshold, topn, debug, queries, cascade, use_nli):
+    if queries is None:
+        queries = make_queries(texts)
+    else:
+        embed_queries(queries)
+    if not queries:
+        return []
+
+    lex_hits = [_lexical_hits(q.premise) for q in queries]
+    all_cands = _retrieve_batch(np.vstack([q.qv for q in queries]), lex_hits, k=k)
+
+    plans = []
+    items, owners = [], []
+    for r, (q, cands) in enumerate(zip(queries, all_cands)):
+        lexical = [cid in lex_hits[r] for cid, _, _ in cands]
+        pending, nli_needed = _nli_plan(cands, lexical, topn, cascade)
+        if not use_nli:
+            pending = []
+        NLI_PER_QUERY.observe(len(pending))
+        plans.append((lexical, pending, nli_needed))
+        for i in pending:
+            items.append((q.premise, cands[i][0], cands[i][1]))
+            owners.append((r, i))
+
+    # one batched NLI pass over every pending pair in the batch
+    nli_scores: List[Dict[int, Tuple[float, float]]] = [{} for _ in queries]
+    nli_failed = [False] * len(queries)
+    try:
+        for (r, i), score in zip(owners, _entailment_cached(items)):
+            nli_scores[r][i] = score
+    except Exception as e:
+        # retry one premise at a time so a bad pair only degrades its own query
+        print(f"[WARNING] Batched NLI failed, retrying per query: {e}")
+        for r in range(len(queries)):
+            mine = [j for j, (owner, _) in enumerate(owners) if owner == r]
+            if not mine:
+                continue
+            try:
+                scores = _entailment_cached([items[j] for j in mine])
+            except Exception as e:
+                print(f"[WARNING] NLI failed, using retrieval scores: {e}")
+                nli_failed[r] = True
+                continue
+            nli_scores[r] = {owners[j][1]: score for j, score in zip(mine, scores)}
+
+    results = []
+    for r, q in enumerate(queries):
+        lexical, pending, nli_needed = plans[r]
+        out = _finalize(q.premise, all_cands[r], lexical, nli_scores[r],
+                        threshold, topn, use_nli=use_nli)
+        if nli_failed[r]:
+            out["nli_degraded"] = True
+        if not q.translated:
+            out["translation_failed"] = True
+        if debug:
+            out["debug"] = {
+                "candidates": len(all_cands[r]),
+                "nli_calls": len(pending),
+                "nli_saved": nli_needed - len(pending),
+            }
+        results.append(out)
+    return results
+
+def infer(text: str, k: int = TOPK, threshold: float = 0.75,
+          topn: int = 5, debug: bool = False,
+          query: Optional[QueryContext] = None,
+          cascade: bool = NLI_CASCADE, use_nli: bool = True):
+
+    # with debug, normalization counts towards debug["timing_ms"] too
+    with timing.collect() if debug else nullcontext():
+        if query is None:
+            query = QueryContext(text)
+        return infer_batch([text], k=k, threshold=threshold, topn=topn,
+                           debug=debug, queries=[query], cascade=cascade,
+                           use_nli=use_nli)[0]
+
+
+def infer_stream(text: str, k: int = TOPK, threshold: float = 0.75,
+                 topn: int = 5, query: Optional[QueryContext] = None,
+                 cascade: bool = NLI_CASCADE, use_nli: bool = True,
+                 batch_size: int = NLI_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    infer() in stages. Yields the retrieval-only result first (stage
+    "retrieval"), then a refreshed result after each NLI batch (stage
+    "nli"); the last item has final=True and matches what infer() returns.
+    Candidates go to NLI best-retrieval-first, `batch_size` at a time.
+    """
+    if query is None:
+        query = QueryContext(text)
+    embed_queries([query])
+    premise = query.premise
+
+    lex_hits = _lexical_hits(premise)
+    cands = _retrieve_batch(query.qv, [lex_hits], k=k)[0]
+    lexical = [cid in lex_hits for cid, _, _ in cands]
+    pending, _ = _nli_plan(cands, lexical, topn, cascade)
+    NLI_PER_QUERY.observe(len(pending) if use_nli else 0)
+    pending.sort(key=lambda i: -cands[i][2])
+
+    out = _finalize(premise, cands, lexical, {}, threshold, topn, use_nli=False)
+    out.update(stage="retrieval", final=not use_nli)
+    if not query.translated:
+        out["translation_failed"] = True
+    yield out
+    if not use_nli:
+        return
+
+    nli_scores: Dict[int, Tuple[float, float]] = {}
+    step = max(1, int(batch_size))
+    start = 0
+    while True:
+        chunk = pending[start:start + step]
+        start += step
+        failed = False
+        if chunk:
+            items = [(premise, cands[i][0], cands[i][1]) for i in chunk]
+            try:
+                for i, score in zip(chunk, _entailment_cached(items, batch_size=step)):
+                    nli_scores[i] = score
+            except Exception as e:
+                # stop here and keep what was scored, as infer() would
+                print(f"[WARNING] NLI failed, using retrieval scores: {e}")
+                failed = True
+        last = failed or start >= len(pending)
+        out = _finalize(premise, cands, lexical, nli_scores, threshold, topn)
+        out.update(stage="nli", final=last, nli_done=len(nli_scores),
+                   nli_total=len(pending))
+        if failed:
+            out["nli_degraded"] = True
+        if not query.translated:
+            out["translation_failed"] = True
+        yield out
+        if last:
+            return
+
+
+def warmup(texts: List[str] = WARMUP_TEXTS) -> None:
+    """
+    Load every model, index and lookup table, then run a few inferences
+    (batched and single) so kernel/allocator initialization happens
+    before the first real request.
+    """
+    _load_enc()
+    _load_index()
+    _load_concepts()
+    _load_concept_embs()
+    _load_lexicon()
+    _load_nli()
+    _load_nli_cache()
+    # straight to the model: the NLI score cache may already hold these pairs
+    _entailment_batch([(t, _hypothesis({"label": "fever"})) for t in texts])
+    infer_batch(list(texts))
+    infer(texts[0])
+    infer(texts[-1], use_nli=False)
+
+
+# -------------------------
+# Bulk scoring (CLI)
+# -------------------------
+def _init_worker(workers: int = 1):
+    # split the cores between pool workers and load every model once
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, workers)))
+    _load_enc()
+    _load_index()
+    _load_concepts()
+    _load_nli()
+
+def _iter_chunks(path: str, size: int):
+    """
+    Lists of up to `size` (line number, record) pairs. A line that isn't
+    valid JSON comes through as (line number, error message) instead.
+    """
+    chunk = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                rec = f"invalid JSON: {e}"
+            else:
+                if not isinstance(rec, dict):
+                    rec = {"text": rec}
+            chunk.append((lineno, rec))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def _score_chunk(items: List[Tuple[int, Any]], field: str = "text") -> List[Dict[str, Any]]:
+    records = [r for _, r in items if isinstance(r, dict)]
+    texts = [str(r.get(field) or "") for r in records]
+    try:
+        outs = infer_batch(texts)
+    except Exception:
+        # fall back to one at a time so a bad record doesn't sink the chunk
+        outs = []
+        for t in texts:
+            try:
+                outs.append(infer(t))
+            except Exception as e:
+                outs.append({"error": str(e)})
+    scored = iter([{"id": r.get("id"), "input": t, **o}
+                   for r, t, o in zip(records, texts, outs)])
+    # unparseable lines keep their place in the output, as error rows
+    return [next(scored) if isinstance(r, dict) else {"id": None, "line": n, "error": r}
+            for n, r in items]
+
+def score_file(in_path: str, out_path: str, field: str = "text",
+               chunk_size: int = 64, workers: int = 1) -> int:
+    """
+    Stream a JSONL file through infer_batch() and write one JSON result
+    per line, in input order. Records are read `chunk_size` at a time and
+    at most 2 chunks per worker are in flight, so memory stays bounded
+    whatever the file size. Returns the number of records written.
+    """
+    out = sys.stdout if out_path == "-" else open(out_path, "w", encoding="utf-8")
+    done = 0
+    t0 = last = time.perf_counter()
+
+    def write(rows):
+        nonlocal done, last
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        done += len(rows)
+        now = time.perf_counter()
+        if now - last >= 5.0:
+            last = now
+            print(f"[bulk] {done} records, {done / (now - t0):.1f} rec/s", file=sys.stderr)
+
+    try:
+        if workers <= 1:
+            _init_worker(1)
+            for chunk in _iter_chunks(in_path, chunk_size):
+                write(_score_chunk(chunk, field))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(workers,)) as pool:
+                inflight = deque()
+                for chunk in _iter_chunks(in_path, chunk_size):
+                    if len(inflight) >= 2 * workers:
+                        write(inflight.popleft().result())
+                    inflight.append(pool.submit(_score_chunk, chunk, field))
+                while inflight:
+                    write(inflight.popleft().result())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"[bulk] done: {done} records in {elapsed:.1f}s "
+          f"({done / max(elapsed, 1e-9):.1f} rec/s)", file=sys.stderr)
+    return done
+
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--text", type=str, required=True)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--text", type=str)
+    src.add_argument("--input", type=str, help="JSONL file, one record per line")
+    ap.add_argument("--output", type=str, default="-", help="results JSONL (default: stdout)")
+    ap.add_argument("--field", type=str, default="text", help="record field holding the text")
+    ap.add_argument("--chunk-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--nli-cache", type=str, default=None,
+                    help="NLI score cache file ('' to disable; default NLI_CACHE_PATH)")
     args = ap.parse_args()
 
-    out = infer(args.text)
-    print(json.dumps(out, ensure_ascii=False, indent=2))
+    if args.nli_cache is not None:
+        # env too, so spawned pool workers pick it up
+        NLI_CACHE_PATH = os.environ["NLI_CACHE_PATH"] = args.nli_cache
+
+    if args.input:
+        score_file(args.input, args.output, field=args.field,
+                   chunk_size=args.chunk_size, workers=args.workers)
+    else:
+        out = infer(args.text)
+        print(json.dumps(out, ensure_ascii=False, indent=2))
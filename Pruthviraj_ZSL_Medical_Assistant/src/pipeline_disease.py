@@ -2,7 +2,6 @@
 
 import os
 import json
-import faiss
 import numpy as np
 
 # 🔁 Reuse the SAME embedding function as pipeline.py
@@ -12,42 +11,63 @@ try:
 except ImportError:
     from src.pipeline import _embed
 
+try:
+    from .resources import register, get as get_resource, file_stamp
+    from .index_io import load_index
+    from . import timing
+except ImportError:
+    from src.resources import register, get as get_resource, file_stamp
+    from src.index_io import load_index
+    from src import timing
+
 BASE = os.path.dirname(os.path.dirname(__file__))
 DISEASE_FILE = os.path.join(BASE, "data", "diseases.jsonl")
 INDEX_FILE = os.path.join(BASE, "models", "faiss_index_diseases.bin")
+# Same vectors as a float32 .npy; memory-mapped and shared between workers
+DISEASE_EMBS = os.path.join(BASE, "models", "disease_embeddings.npy")
 
-print("🔍 Loading diseases dataset...")
-diseases = []
-with open(DISEASE_FILE, "r", encoding="utf-8") as f:
-    for line in f:
-        line = line.strip()
-        if not line:
-            continue
-        diseases.append(json.loads(line))
 
-print(f"📌 Loaded {len(diseases)} diseases.")
+def _build_diseases():
+    print("🔍 Loading diseases dataset...")
+    diseases = []
+    with open(DISEASE_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            diseases.append(json.loads(line))
+    print(f"📌 Loaded {len(diseases)} diseases.")
+    return diseases
 
-print("🔍 Loading disease FAISS index...")
-index = faiss.read_index(INDEX_FILE)
-dim = index.d
-print(f"📌 Disease index dim = {dim}")
 
+def _build_index():
+    print("🔍 Loading disease FAISS index...")
+    index = load_index(INDEX_FILE, DISEASE_EMBS)
+    print(f"📌 Disease index dim = {index.d}")
+    return index
 
-def predict_disease(text: str, top_k: int = 5):
-    """
-    Given free-text symptoms, return top-k matching diseases.
-    Uses same encoder as src/pipeline.py (intfloat/multilingual-e5-base).
-    """
-    text = (text or "").strip()
-    if not text:
-        return {"input": text, "predictions": []}
 
-    # Embed using SAME model as concepts index
-    qv = _embed([text]).astype("float32")
-    scores, ids = index.search(qv, top_k)
+register("disease.records", _build_diseases)
+register("disease.index", _build_index)
+
+
+def _load_diseases():
+    return get_resource("disease.records")
+
+
+def _load_index():
+    return get_resource("disease.index")
+
+
+def version():
+    """Identifies the disease data and index on disk (for cache keys)."""
+    return (file_stamp(DISEASE_FILE), file_stamp(INDEX_FILE), file_stamp(DISEASE_EMBS))
 
+
+def _format_hits(scores, ids):
+    diseases = _load_diseases()
     results = []
-    for score, idx in zip(scores[0], ids[0]):
+    for score, idx in zip(scores, ids):
         if idx < 0 or idx >= len(diseases):
             continue
         d = diseases[idx]
@@ -59,11 +79,46 @@ def predict_disease(text: str, top_k: int = 5):
             "specialists": d.get("specialists", []),
             "recommended_tests": d.get("recommended_tests", []),
         })
+    return results
+
+
+def predict_disease_batch(texts, top_k: int = 5, qvs: np.ndarray = None):
+    """
+    predict_disease() for many texts: one embedding call and one index
+    search for the whole batch. `qvs` may hold one precomputed query row
+    per text. Returns one result dict per text, in order.
+    """
+    texts = [(t or "").strip() for t in texts]
+    outs = [{"input": t, "predictions": []} for t in texts]
+    rows = [i for i, t in enumerate(texts) if t]
+    if not rows:
+        return outs
+
+    # Embed using SAME model as concepts index
+    if qvs is None:
+        qvs = _embed([texts[i] for i in rows])
+    else:
+        qvs = np.asarray(qvs)[rows]
+    index = _load_index()
+    with timing.stage("disease_search"):
+        scores, ids = index.search(np.ascontiguousarray(qvs, dtype="float32"), top_k)
+
+    for r, i in enumerate(rows):
+        outs[i]["predictions"] = _format_hits(scores[r], ids[r])
+    return outs
+
+
+def predict_disease(text: str, top_k: int = 5, qv: np.ndarray = None):
+    """
+    Given free-text symptoms, return top-k matching diseases.
+    Uses same encoder as src/pipeline.py (intfloat/multilingual-e5-base).
+    Pass `qv` (e.g. QueryContext.qv) to reuse an existing query embedding.
+    """
+    return predict_disease_batch([text], top_k=top_k, qvs=qv)[0]
+
 
-    return {
-        "input": text,
-        "predictions": results
-    }
+def warmup():
+    predict_disease_batch(["fever and cough", "chest pain"])
 
 
 if __name__ == "__main__":
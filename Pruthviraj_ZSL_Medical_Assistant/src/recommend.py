@@ -1,7 +1,9 @@
 # src/recommend.py
 import os
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import resources
 
 # Fuzzy matching
 try:
@@ -18,46 +20,50 @@ CONCEPTS_PATHS = [
     os.path.join(ROOT, "data", "concepts.jsonl")
 ]
 
-_CONCEPTS: Optional[List[Dict[str, Any]]] = None
-_PHRASE_TO_IDX: Optional[Dict[str, int]] = None
+def _build_concepts() -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    for p in CONCEPTS_PATHS:
+        if os.path.exists(p):
+            path = p
+            break
+    else:
+        raise FileNotFoundError("No concepts file found. Expected one of: " + ", ".join(CONCEPTS_PATHS))
+    concepts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                concepts.append(json.loads(line))
+    # build phrase map for fuzzy matching
+    phrase_to_idx = {}
+    for idx, c in enumerate(concepts):
+        label = (c.get("label") or "").strip().lower()
+        if label:
+            phrase_to_idx[label] = idx
+        syns = c.get("synonyms", []) or []
+        if isinstance(syns, str):
+            syns = [s.strip() for s in syns.split("|") if s.strip()]
+        for s in syns:
+            s2 = (s or "").strip().lower()
+            if s2:
+                phrase_to_idx[s2] = idx
+    return concepts, phrase_to_idx
+
+resources.register("recommend.concepts", _build_concepts)
 
 def _load_concepts() -> List[Dict[str, Any]]:
-    global _CONCEPTS, _PHRASE_TO_IDX
-    if _CONCEPTS is None:
-        for p in CONCEPTS_PATHS:
-            if os.path.exists(p):
-                path = p
-                break
-        else:
-            raise FileNotFoundError("No concepts file found. Expected one of: " + ", ".join(CONCEPTS_PATHS))
-        _CONCEPTS = []
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    _CONCEPTS.append(json.loads(line))
-        # build phrase map for fuzzy matching
-        _PHRASE_TO_IDX = {}
-        for idx, c in enumerate(_CONCEPTS):
-            label = (c.get("label") or "").strip().lower()
-            if label:
-                _PHRASE_TO_IDX[label] = idx
-            syns = c.get("synonyms", []) or []
-            if isinstance(syns, str):
-                syns = [s.strip() for s in syns.split("|") if s.strip()]
-            for s in syns:
-                s2 = (s or "").strip().lower()
-                if s2:
-                    _PHRASE_TO_IDX[s2] = idx
-    return _CONCEPTS
+    return resources.get("recommend.concepts")[0]
+
+def _phrase_to_idx() -> Dict[str, int]:
+    return resources.get("recommend.concepts")[1]
 
 def _best_fuzzy_match(label: str, score_cutoff: int = 70) -> Optional[Dict[str, Any]]:
     """
     Use rapidfuzz to match a label/sentence to the closest concept phrase (label or synonym).
     Returns the concept dict if match score >= cutoff, else None.
     """
-    if process is None or _PHRASE_TO_IDX is None:
+    if process is None:
         return None
-    choices = list(_PHRASE_TO_IDX.keys())
+    phrase_to_idx = _phrase_to_idx()
+    choices = list(phrase_to_idx.keys())
     # process.extractOne returns (match, score, index)
     try:
         match = process.extractOne(label.lower(), choices, scorer=fuzz.partial_ratio)
@@ -67,7 +73,7 @@ def _best_fuzzy_match(label: str, score_cutoff: int = 70) -> Optional[Dict[str,
         return None
     matched_phrase, score, _ = match
     if score >= score_cutoff:
-        idx = _PHRASE_TO_IDX.get(matched_phrase)
+        idx = phrase_to_idx.get(matched_phrase)
         if idx is not None:
             concepts = _load_concepts()
             return concepts[idx]
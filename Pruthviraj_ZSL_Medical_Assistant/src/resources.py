@@ -0,0 +1,121 @@
+# src/resources.py
+"""
+Process-wide registry of lazily loaded resources (models, indexes,
+lookup tables).
+
+Modules register a loader under a name and fetch the value with get().
+The first caller runs the loader while holding that resource's lock;
+concurrent callers wait for it and share the result instead of loading
+their own copy. A failed load raises to its callers and is retried on
+the next get(). Load time and the change in process RSS during the load
+are recorded per resource (RSS is approximate if several resources load
+at once).
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from .metrics import Gauge
+
+LOAD_SECONDS = Gauge("resource_load_seconds", "Time taken to load a resource",
+                     labels=("resource",))
+LOAD_RSS = Gauge("resource_rss_bytes", "Process RSS growth while loading a resource",
+                 labels=("resource",))
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is a high-water mark (KiB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+_UNLOADED = object()   # Entry.value before a load and after invalidate()
+
+
+class _Entry:
+    __slots__ = ("loader", "lock", "value", "load_seconds", "rss_bytes")
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.value = _UNLOADED
+        self.load_seconds = None
+        self.rss_bytes = None
+
+
+_entries: Dict[str, _Entry] = {}
+_entries_lock = threading.Lock()
+
+
+def register(name: str, loader: Callable[[], Any]) -> None:
+    """Declare a resource; re-registering an existing name is a no-op."""
+    with _entries_lock:
+        if name not in _entries:
+            _entries[name] = _Entry(loader)
+
+
+def get(name: str) -> Any:
+    """Return the resource, loading it once (single-flight) on first use."""
+    entry = _entries[name]
+    # one read of entry.value: invalidate() may reset it at any moment
+    value = entry.value
+    if value is not _UNLOADED:
+        return value
+    with entry.lock:
+        value = entry.value
+        if value is _UNLOADED:
+            rss0 = _rss_bytes()
+            t0 = time.perf_counter()
+            value = entry.loader()
+            entry.load_seconds = time.perf_counter() - t0
+            entry.rss_bytes = max(0, _rss_bytes() - rss0)
+            entry.value = value
+            LOAD_SECONDS.set(entry.load_seconds, resource=name)
+            LOAD_RSS.set(entry.rss_bytes, resource=name)
+    return value
+
+
+def is_loaded(name: str) -> bool:
+    entry = _entries.get(name)
+    return entry is not None and entry.value is not _UNLOADED
+
+
+def invalidate(name: str) -> None:
+    """Drop a loaded value so the next get() reloads it."""
+    entry = _entries.get(name)
+    if entry is None:
+        return
+    with entry.lock:
+        entry.value = _UNLOADED
+
+
+def file_stamp(path: str):
+    """(mtime_ns, size) of a file, or None if it is missing; for version keys."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Per-resource load state, load time (s) and RSS growth (bytes)."""
+    with _entries_lock:
+        items = list(_entries.items())
+    return {
+        name: {
+            "loaded": e.value is not _UNLOADED,
+            "load_seconds": e.load_seconds,
+            "rss_bytes": e.rss_bytes,
+        }
+        for name, e in items
+    }
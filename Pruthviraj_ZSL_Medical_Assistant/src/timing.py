@@ -0,0 +1,67 @@
+# src/timing.py
+"""
+Hot-path stage timing.
+
+    with timing.stage("faiss_search"):
+        ...
+
+records the block's wall time in the `pipeline_stage_seconds{stage=...}`
+histogram. Inside a `timing.collect()` block the same timings are also
+summed per stage into a dict, which is how infer(debug=True) reports a
+breakdown. Stages may nest (e.g. "embed" contains "encode"), so the
+totals are inclusive and don't add up to the wall time. The dict travels
+in a contextvar, so it follows work handed to the inference executor.
+Stages also become spans of the current request's trace, if it has one
+(see tracing.py).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from . import tracing
+from .metrics import Histogram
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Time spent per pipeline stage",
+                          labels=("stage",))
+
+_breakdown: contextvars.ContextVar[Optional[Dict[str, float]]] = \
+    contextvars.ContextVar("timing_breakdown", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    span = tracing.open_span(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        if span is not None:
+            tracing.close_span(span)
+        STAGE_SECONDS.observe(dt, stage=name)
+        totals = _breakdown.get()
+        if totals is not None:
+            totals[name] = totals.get(name, 0.0) + dt
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """
+    Sum stage timings (seconds) recorded inside the block into the
+    yielded dict. A nested collect() shares the outer block's dict.
+    """
+    totals = _breakdown.get()
+    if totals is not None:
+        yield totals
+        return
+    totals = {}
+    token = _breakdown.set(totals)
+    try:
+        yield totals
+    finally:
+        _breakdown.reset(token)
+
+
+def as_ms(totals: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(s * 1000.0, 3) for name, s in sorted(totals.items())}
@@ -0,0 +1,277 @@
+# src/tracing.py
+"""
+Sampled request traces and on-demand profiling.
+
+Tracing: a sampled request (TRACE_SAMPLE_RATE, or forced) gets a root
+span; every timing.stage() run on its behalf - including on executor
+threads, via contextvars - becomes a child span. When the request ends
+the span tree is appended as one JSON line to TRACE_PATH.
+
+Profiling: arm("cprofile" | "tracemalloc", n), or PROFILE=mode:n in the
+environment, profiles the next n requests and writes a report per
+request to PROFILE_DIR. cProfile covers the calls made on inference
+executor threads, where the model work runs, one task at a time: a task
+that starts while another is being profiled runs unprofiled.
+
+With sampling off and nothing armed, the hot path pays one contextvar
+lookup per stage and one integer check per request.
+"""
+import cProfile
+import contextvars
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+TRACE_PATH = os.environ.get("TRACE_PATH", os.path.join(ROOT, "logs", "traces.jsonl"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(ROOT, "logs", "profiles"))
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+# -------------------------
+# Spans
+# -------------------------
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    def to_dict(self, t0: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        out = {
+            "name": self.name,
+            "start_ms": round((self.start - t0) * 1000.0, 3),
+            "duration_ms": round((end - self.start) * 1000.0, 3),
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(t0) for c in list(self.children)]
+        return out
+
+
+_current: contextvars.ContextVar[Optional[Span]] = \
+    contextvars.ContextVar("trace_span", default=None)
+_sink_lock = threading.Lock()
+
+
+def open_span(name: str) -> Optional[Tuple[Span, contextvars.Token]]:
+    """Open a child span if a trace is active (used by timing.stage)."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    span = Span(name)
+    parent.children.append(span)
+    return span, _current.set(span)
+
+
+def close_span(handle: Tuple[Span, contextvars.Token]) -> None:
+    span, token = handle
+    span.end = time.perf_counter()
+    _current.reset(token)
+
+
+@contextmanager
+def trace(name: str, force: bool = False, **attrs) -> Iterator[Optional[Span]]:
+    """Root span for one request, if sampled (or forced); written out on exit."""
+    if not force and (TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE):
+        yield None
+        return
+    root = Span(name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        _write(root)
+
+
+def _write(root: Span) -> None:
+    record = {
+        "trace_id": uuid.uuid4().hex,
+        "time": time.time(),
+        **root.to_dict(root.start),
+    }
+    try:
+        with _sink_lock:
+            os.makedirs(os.path.dirname(TRACE_PATH) or ".", exist_ok=True)
+            with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        print(f"[WARNING] Could not write trace: {e}")
+
+
+# -------------------------
+# Profiling
+# -------------------------
+class _Session:
+    """Profiling state for one request."""
+
+    def __init__(self, mode: str, name: str):
+        self.mode = mode
+        self.name = name
+        self.profiles: List[cProfile.Profile] = []
+        self.snapshot = None
+
+
+_profile: contextvars.ContextVar[Optional[_Session]] = \
+    contextvars.ContextVar("profile_session", default=None)
+_armed = {"mode": None, "remaining": 0}
+_armed_lock = threading.Lock()
+_tracemalloc_users = 0   # sessions using tracemalloc; it is stopped when this drops to 0
+# held while a task runs under cProfile; on Python 3.12+ only one profiler
+# can be enabled per process
+_cprofile_lock = threading.Lock()
+
+
+def arm(mode: str, requests: int) -> None:
+    """Profile the next `requests` requests with `mode` (0 disarms)."""
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"unknown profile mode {mode!r}; expected one of {PROFILE_MODES}")
+    with _armed_lock:
+        _armed["mode"] = mode
+        _armed["remaining"] = max(0, int(requests))
+
+
+def armed() -> Dict[str, Any]:
+    return dict(_armed)
+
+
+def _claim() -> Optional[str]:
+    if not _armed["remaining"]:
+        return None
+    with _armed_lock:
+        if _armed["remaining"] <= 0:
+            return None
+        _armed["remaining"] -= 1
+        return _armed["mode"]
+
+
+@contextmanager
+def profile_request(name: str) -> Iterator[Optional[_Session]]:
+    """Profile this request if profiling is armed; the report is written on exit."""
+    mode = _claim()
+    if mode is None:
+        yield None
+        return
+    global _tracemalloc_users
+    session = _Session(mode, name)
+    if mode == "tracemalloc":
+        with _armed_lock:
+            if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            _tracemalloc_users += 1
+        session.snapshot = tracemalloc.take_snapshot()
+    token = _profile.set(session)
+    try:
+        yield session
+    finally:
+        _profile.reset(token)
+        _report(session)
+        if mode == "tracemalloc":
+            with _armed_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+
+
+def run_profiled(fn: Callable[[], Any]) -> Any:
+    """Call fn(), under cProfile if the current request is being profiled."""
+    session = _profile.get()
+    if session is None or session.mode != "cprofile":
+        return fn()
+    if not _cprofile_lock.acquire(blocking=False):
+        return fn()   # another task is being profiled
+    try:
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            return fn()
+        finally:
+            prof.disable()
+            session.profiles.append(prof)
+    finally:
+        _cprofile_lock.release()
+
+
+def _report(session: _Session) -> None:
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{uuid.uuid4().hex[:6]}"
+    base = os.path.join(PROFILE_DIR, f"{stamp}-{session.name}-{session.mode}")
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if session.mode == "cprofile":
+            if not session.profiles:
+                return
+            buf = io.StringIO()
+            stats = pstats.Stats(*session.profiles, stream=buf)
+            stats.dump_stats(base + ".prof")
+            stats.sort_stats("cumulative").print_stats(50)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(buf.getvalue())
+        else:
+            after = tracemalloc.take_snapshot()
+            # process-wide: allocations by concurrent requests show up too
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                for stat in after.compare_to(session.snapshot, "lineno")[:50]:
+                    f.write(f"{stat}\n")
+    except OSError as e:
+        print(f"[WARNING] Could not write profile report: {e}")
+
+
+# -------------------------
+# Carrying context across the micro-batcher
+# -------------------------
+def capture() -> Optional[Tuple[Optional[Span], Optional[_Session]]]:
+    """The caller's trace span and profile session, if either is active."""
+    span, session = _current.get(), _profile.get()
+    if span is None and session is None:
+        return None
+    return span, session
+
+
+@contextmanager
+def batch_scope(captured: List[Tuple[Optional[Span], Optional[_Session]]],
+                name: str, **attrs) -> Iterator[None]:
+    """
+    Run shared batch work for several requests: one span, attached to
+    every traced request's tree, and the first profile session among them.
+    """
+    parents = [s for s, _ in captured if s is not None]
+    sessions = [p for _, p in captured if p is not None]
+    span = Span(name, attrs)
+    for p in parents:
+        p.children.append(span)
+    span_token = _current.set(span if parents else None)
+    prof_token = _profile.set(sessions[0] if sessions else None)
+    try:
+        yield
+    finally:
+        span.end = time.perf_counter()
+        _profile.reset(prof_token)
+        _current.reset(span_token)
+
+
+def _arm_from_env() -> None:
+    spec = os.environ.get("PROFILE", "")
+    if spec:
+        mode, _, n = spec.partition(":")
+        arm(mode, int(n or "1"))
+
+
+_arm_from_env()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# tests import the app as `src.*`; make that work from any working directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
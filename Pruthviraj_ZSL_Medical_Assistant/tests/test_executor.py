@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from src.executor import InferenceExecutor
+
+
+def test_cancelled_queued_tasks_release_their_slots():
+    ex = InferenceExecutor(workers=1, max_queue=8, torch_threads=1, name="test-infer")
+
+    async def main():
+        calls = [asyncio.wait_for(ex.run(time.sleep, 0.3), 0.1) for _ in range(5)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+
+    try:
+        asyncio.run(main())
+        ex.shutdown(wait=True)   # let the task that did start finish
+        assert ex.depth == 0
+        assert ex.running == 0
+    finally:
+        ex.shutdown(wait=False)
+
+
+def test_queue_full_after_cancellations_recovers():
+    ex = InferenceExecutor(workers=1, max_queue=2, torch_threads=1, name="test-infer")
+
+    async def main():
+        for _ in range(3):
+            try:
+                await asyncio.wait_for(ex.run(time.sleep, 0.2), 0.01)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(0.5)
+        return await ex.run(lambda: 42)
+
+    try:
+        assert asyncio.run(main()) == 42
+        assert ex.depth == 0
+    finally:
+        ex.shutdown(wait=False)
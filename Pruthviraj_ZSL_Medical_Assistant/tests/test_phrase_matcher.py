@@ -0,0 +1,135 @@
+"""
+PhraseMatcher against the per-phrase regexes it replaced, on the real
+concept and phrasebook data.
+"""
+import csv
+import json
+import os
+import re
+
+from src.phrase_matcher import PhraseMatcher, alnum_boundary, word_boundary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCEPTS = os.path.join(ROOT, "data", "concepts.jsonl")
+PHRASEBOOK = os.path.join(ROOT, "data", "phrasebook.csv")
+
+# where a phrase lands in a sentence, including neighbours that break a match
+CONTEXTS = [
+    "{}",
+    "I have {} since two days",
+    "{}, and also a cold",
+    "Severe {}!",
+    "x{} here",
+    "{}9 here",
+    "(({}))",
+    "my_{}_today",
+    "{}s for a week",
+]
+
+
+def _concept_phrases():
+    # same phrase list as pipeline._lexicon(): label + synonyms, lower-cased
+    out = []
+    with open(CONCEPTS, "r", encoding="utf-8") as f:
+        concepts = [json.loads(l) for l in f if l.strip()]
+    for idx, c in enumerate(concepts):
+        phrases = [c.get("label", "").strip().lower()]
+        syns = c.get("synonyms", []) or []
+        if isinstance(syns, str):
+            syns = [s.strip() for s in syns.split("|") if s.strip()]
+        phrases += [s.strip().lower() for s in syns if s]
+        for p in dict.fromkeys(phrases):
+            if p:
+                out.append((p, idx))
+    return out
+
+
+def _phrasebook_rows():
+    rows = []
+    with open(PHRASEBOOK, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            patt, repl = row.get("pattern"), row.get("replacement")
+            if patt and repl:
+                rows.append((patt.strip(), repl.strip()))
+    return rows
+
+
+def _concept_regex_hits(phrases, text):
+    t = text.lower()
+    return {idx for p, idx in phrases
+            if re.search(rf"(?<![a-z0-9]){re.escape(p)}(?![a-z0-9])", t)}
+
+
+def _phrasebook_regex_sub(rows, text):
+    for patt, repl in rows:
+        text = re.sub(rf"\b{re.escape(patt)}\b", repl, text, flags=re.IGNORECASE)
+    return text
+
+
+def _phrasebook_regex_search(rows, text):
+    return any(re.search(rf"\b{re.escape(patt)}\b", text, flags=re.IGNORECASE)
+               for patt, _ in rows)
+
+
+def _matcher(pairs, boundary):
+    m = PhraseMatcher(boundary=boundary)
+    for phrase, value in pairs:
+        m.add(phrase, value)
+    return m.build()
+
+
+def test_concept_values_match_regex():
+    phrases = _concept_phrases()
+    m = _matcher(phrases, alnum_boundary)
+    texts = [ctx.format(p) for p, _ in phrases for ctx in CONTEXTS]
+    texts += [ctx.format(p.upper()) for p, _ in phrases for ctx in CONTEXTS[:2]]
+    # pairs of phrases in one text, so overlapping and adjacent hits mix
+    texts += [f"{a} and {b}" for (a, _), (b, _) in zip(phrases, phrases[1:])]
+    texts += [f"{a}{b}" for (a, _), (b, _) in zip(phrases, phrases[1:])]
+    for text in texts:
+        assert m.values(text) == _concept_regex_hits(phrases, text), text
+
+
+def test_phrasebook_search_matches_regex():
+    rows = _phrasebook_rows()
+    m = _matcher(rows, word_boundary)
+    texts = [ctx.format(p) for p, _ in rows for ctx in CONTEXTS]
+    texts += ["no phrasebook words in here", "", "   "]
+    for text in texts:
+        assert m.search(text) == _phrasebook_regex_search(rows, text), text
+
+
+def _shadowed(rows):
+    """Patterns that an earlier, shorter row matches inside of."""
+    out = set()
+    for i, (patt, _) in enumerate(rows):
+        for other, _ in rows[:i]:
+            if other != patt and re.search(rf"\b{re.escape(other)}\b", patt, flags=re.IGNORECASE):
+                out.add(patt)
+    return out
+
+
+def test_phrasebook_sub_matches_regex():
+    rows = _phrasebook_rows()
+    m = _matcher(rows, word_boundary)
+    shadowed = _shadowed(rows)
+    for patt, repl in rows:
+        for ctx in CONTEXTS:
+            text = ctx.format(patt)
+            whole = rf"\b{re.escape(patt)}\b"
+            if patt in shadowed and re.search(whole, text, flags=re.IGNORECASE):
+                # documented change: the longest pattern wins, not CSV order
+                assert m.sub(text) == re.sub(whole, repl, text, flags=re.IGNORECASE), text
+            else:
+                assert m.sub(text) == _phrasebook_regex_sub(rows, text), text
+
+
+def test_phrasebook_overlap_is_leftmost_longest():
+    rows = _phrasebook_rows()
+    m = _matcher(rows, word_boundary)
+    text = "Khansi mein khoon aa raha hai"
+    assert m.sub(text) == "blood in sputum aa raha hai"
+    # the regex loop applied the earlier 'khansi' row first
+    assert _phrasebook_regex_sub(rows, text).startswith("cough mein khoon")
+    # a lone shorter pattern still rewrites as before
+    assert m.sub("bahut khansi hai") == _phrasebook_regex_sub(rows, "bahut khansi hai")